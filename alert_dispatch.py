@@ -0,0 +1,141 @@
+import asyncio
+import math
+import traceback
+
+from rate_limit import TokenBucket
+
+# Discord limits
+MESSAGE_LIMIT = 2000
+CHANNEL_RATE = (5, 5.0)   # 5 messages per 5 seconds per channel
+GLOBAL_RATE = 50          # requests per second per bot
+
+SUBSCRIPTIONS_FOR_SQL = """
+    SELECT channel_id, commodity_name, min_change
+    FROM alert_subscriptions
+    WHERE commodity_name = '*' OR commodity_name IN ({placeholders})
+"""
+
+GUILD_SUBSCRIPTIONS_SQL = """
+    SELECT channel_id, commodity_name, min_change
+    FROM alert_subscriptions
+    WHERE guild_id = ?
+    ORDER BY channel_id, commodity_name
+"""
+
+
+async def load_subscriptions(repo, commodity_names):
+    """Subscriptions that could match an alert batch: catch-alls plus the named commodities"""
+    names = list(commodity_names)
+    sql = SUBSCRIPTIONS_FOR_SQL.format(placeholders=", ".join("?" * len(names)) or "NULL")
+    return await repo.fetchall(sql, names, name="alert_subscriptions")
+
+
+def subscribe(conn, guild_id, channel_id, commodity_name, min_change):
+    """Writer-side upsert of one subscription"""
+    conn.execute("""
+        INSERT INTO alert_subscriptions (guild_id, channel_id, commodity_name, min_change)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (channel_id, commodity_name) DO UPDATE SET min_change = excluded.min_change
+    """, (guild_id, channel_id, commodity_name, min_change))
+
+
+def unsubscribe(conn, channel_id, commodity_name=None):
+    """Writer-side removal of one subscription, or every subscription of the channel; returns rows removed"""
+    if commodity_name is None:
+        return conn.execute("DELETE FROM alert_subscriptions WHERE channel_id = ?", (channel_id,)).rowcount
+    return conn.execute("DELETE FROM alert_subscriptions WHERE channel_id = ? AND commodity_name = ?",
+                        (channel_id, commodity_name)).rowcount
+
+
+def format_alert(alert):
+    text = f"**{alert.name}**: {'; '.join(alert.reasons)}\n"
+    if not math.isnan(alert.previous):  # no baseline yet on a commodity's first cycle
+        text += f"Previous Price: {alert.previous} UEC\n"
+    return text + f"New Price: {alert.current} UEC\n\n"
+
+
+def split_messages(blocks, header="**Commodity Price Alerts:**\n", limit=MESSAGE_LIMIT):
+    """Pack alert blocks into as few messages under `limit` as possible, never splitting a block"""
+    messages, current = [], header
+    for block in blocks:
+        block = block[:limit - len(header)]
+        if len(current) + len(block) > limit:
+            messages.append(current)
+            current = header
+        current += block
+    if current != header:
+        messages.append(current)
+    return messages
+
+
+def match(alerts, subscriptions):
+    """Group alerts per channel: {channel_id: [alert, ...]} in alert order"""
+    by_name = {alert.name: alert for alert in alerts}
+    per_channel = {}
+    for channel_id, commodity_name, min_change in subscriptions:
+        candidates = alerts if commodity_name == "*" else [by_name[commodity_name]] if commodity_name in by_name else []
+        for alert in candidates:
+            if min_change is None or abs(alert.change) >= min_change:  # NaN change never passes a threshold
+                per_channel.setdefault(channel_id, {})[alert.name] = alert
+    order = {alert.name: i for i, alert in enumerate(alerts)}
+    return {channel: sorted(found.values(), key=lambda a: order[a.name]) for channel, found in per_channel.items()}
+
+
+class AlertDispatcher:
+    """Fans alert batches out to subscribed channels under Discord's rate limits
+
+    Each channel gets its own ordered outbox drained by a short-lived task that waits on that
+    channel's bucket, so a busy channel never delays the others. A global bucket and a
+    semaphore cap the bot-wide request rate and the number of sends in flight.
+    """
+
+    def __init__(self, send, max_in_flight=10):
+        self.send = send  # async send(channel_id, content)
+        self._global = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._buckets = {}   # channel_id -> TokenBucket
+        self._outboxes = {}  # channel_id -> list of pending messages
+        self._drainers = {}  # channel_id -> task
+        self.sent = 0
+        self.failed = 0
+
+    def dispatch(self, alerts, subscriptions, fallback_channels=()):
+        """Queue one alert batch; returns the number of messages queued"""
+        per_channel = match(alerts, subscriptions)
+        for channel_id in fallback_channels:
+            per_channel.setdefault(channel_id, alerts)
+
+        queued = 0
+        for channel_id, channel_alerts in per_channel.items():
+            messages = split_messages(format_alert(a) for a in channel_alerts)
+            self._outboxes.setdefault(channel_id, []).extend(messages)
+            queued += len(messages)
+            if channel_id not in self._drainers:
+                self._drainers[channel_id] = asyncio.create_task(self._drain(channel_id))
+        return queued
+
+    async def _drain(self, channel_id):
+        bucket = self._buckets.setdefault(channel_id, TokenBucket(CHANNEL_RATE[0] / CHANNEL_RATE[1], CHANNEL_RATE[0]))
+        outbox = self._outboxes[channel_id]
+        try:
+            while outbox:
+                content = outbox.pop(0)
+                await bucket.acquire()
+                await self._global.acquire()
+                async with self._in_flight:
+                    try:
+                        await self.send(channel_id, content)
+                        self.sent += 1
+                    except Exception as e:
+                        self.failed += 1
+                        print(f"❌ Failed to send alert to channel {channel_id}: {e}")
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self._drainers.pop(channel_id, None)
+            self._outboxes.pop(channel_id, None)
+
+    async def join(self):
+        """Wait until every queued message has been sent or dropped"""
+        while self._drainers:
+            await asyncio.gather(*list(self._drainers.values()), return_exceptions=True)
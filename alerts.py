@@ -0,0 +1,139 @@
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+ALERT_STATE_SQL = """
+    SELECT c.name, s.baseline_sell, s.last_alert_at
+    FROM alert_state s
+    JOIN commodities c ON c.commodity_id = s.commodity_id
+"""
+
+# Hourly mean sell prices for the window, oldest first
+HOURLY_HISTORY_SQL = """
+    SELECT c.name, r.bucket, r.sum_sell / r.samples
+    FROM price_rollups_hourly r
+    JOIN commodities c ON c.commodity_id = r.commodity_id
+    WHERE r.bucket >= strftime('%Y-%m-%d %H:00:00', 'now', ?)
+      AND r.bucket < strftime('%Y-%m-%d %H:00:00', 'now')
+    ORDER BY r.bucket
+"""
+
+
+def save_alert_state(conn, rows):
+    """Writer-side: rows are (name, baseline_sell, last_alert_at or None)"""
+    # Ingest only registers commodities with both prices; sell-only ones need an id here too
+    conn.executemany("INSERT OR IGNORE INTO commodities (name) VALUES (?)", [(name,) for name, _, _ in rows])
+    conn.executemany("""
+        INSERT INTO alert_state (commodity_id, baseline_sell, last_alert_at)
+        SELECT commodity_id, ?, ? FROM commodities WHERE name = ?
+        ON CONFLICT (commodity_id) DO UPDATE SET
+            baseline_sell = excluded.baseline_sell,
+            last_alert_at = COALESCE(excluded.last_alert_at, last_alert_at)
+    """, [(baseline, alerted_at, name) for name, baseline, alerted_at in rows])
+
+
+@dataclass
+class Alert:
+    name: str
+    previous: float
+    current: float
+    change: float                 # fraction vs. the previous cycle
+    zscore: float = float("nan")  # vs. the rolling window
+    reasons: list = field(default_factory=list)
+
+
+def detect(current, baseline, history, since_alert, *, pct_threshold, z_threshold,
+           trend_points, trend_threshold, cooldown, min_history):
+    """Vectorized rule evaluation over C commodities
+
+    current, baseline, since_alert: shape (C,); history: shape (C, H) hourly means, NaN where missing.
+    Returns (fire mask, change, zscore, trend change, pct mask, z mask, trend mask).
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        change = (current - baseline) / baseline
+        pct = np.abs(change) >= pct_threshold
+
+        counts = np.sum(~np.isnan(history), axis=1)
+        # Commodities with no history at all get a zero row (std 0, never a z alert) instead of an all-NaN slice
+        filled = np.where(counts[:, None] > 0, history, 0.0)
+        mean = np.nanmean(filled, axis=1)
+        std = np.nanstd(filled, axis=1)
+        zscore = (current - mean) / std
+        z = (counts >= min_history) & (std > 0) & (np.abs(zscore) >= z_threshold)
+
+        # Sustained trend: the last `trend_points` hourly means plus the current price move strictly one way
+        tail = np.concatenate([history[:, -trend_points:], current[:, None]], axis=1)
+        steps = np.diff(tail, axis=1)
+        rising = np.all(steps > 0, axis=1)
+        falling = np.all(steps < 0, axis=1)
+        total = (tail[:, -1] - tail[:, 0]) / tail[:, 0]
+        trend = (rising | falling) & (np.abs(total) >= trend_threshold) & (history.shape[1] >= trend_points)
+
+    fire = (pct | z | trend) & ~(since_alert < cooldown)
+    return fire, change, zscore, total, pct, z, trend
+
+
+class AlertEngine:
+    """Evaluates every commodity of a snapshot in one NumPy pass and persists its baseline"""
+
+    def __init__(self, repo, pct_threshold=0.05, z_threshold=3.0, window_hours=24, trend_hours=4,
+                 trend_threshold=0.03, cooldown_minutes=60, min_history=6):
+        self.repo = repo
+        self.pct_threshold = pct_threshold
+        self.z_threshold = z_threshold
+        self.window_hours = window_hours
+        self.trend_hours = trend_hours
+        self.trend_threshold = trend_threshold
+        self.cooldown = cooldown_minutes * 60
+        self.min_history = min_history
+
+    async def evaluate(self, snapshot):
+        """Return the alerts for `snapshot` and store its prices as the next baseline"""
+        prices = {c["name"]: c["price_sell"] for c in snapshot.commodities
+                  if c.get("name") and c.get("price_sell") and c["price_sell"] > 0}
+        if not prices:
+            return []
+        names = list(prices)
+        index = {name: i for i, name in enumerate(names)}
+        now = int(time.time())
+
+        current = np.array([prices[n] for n in names], dtype=np.float64)
+        baseline = np.full(len(names), np.nan)
+        since_alert = np.full(len(names), np.inf)
+        for name, baseline_sell, last_alert_at in await self.repo.fetchall(ALERT_STATE_SQL, name="alert_state"):
+            if name in index:
+                baseline[index[name]] = baseline_sell
+                if last_alert_at is not None:
+                    since_alert[index[name]] = now - last_alert_at
+
+        rows = await self.repo.fetchall(HOURLY_HISTORY_SQL, (f"-{self.window_hours} hours",), name="hourly_history")
+        buckets = sorted({bucket for _, bucket, _ in rows})
+        column = {bucket: j for j, bucket in enumerate(buckets)}
+        history = np.full((len(names), max(len(buckets), 1)), np.nan)
+        for name, bucket, mean_sell in rows:
+            if name in index:
+                history[index[name], column[bucket]] = mean_sell
+
+        fire, change, zscore, trend_change, pct, z, trend = detect(
+            current, baseline, history, since_alert,
+            pct_threshold=self.pct_threshold, z_threshold=self.z_threshold,
+            trend_points=self.trend_hours, trend_threshold=self.trend_threshold,
+            cooldown=self.cooldown, min_history=self.min_history,
+        )
+
+        alerts = []
+        for i in np.flatnonzero(fire):
+            reasons = []
+            if pct[i]:
+                reasons.append(f"{change[i] * 100:+.2f}% since last check")
+            if z[i]:
+                reasons.append(f"{zscore[i]:+.1f}σ vs {self.window_hours}h average")
+            if trend[i]:
+                reasons.append(f"{'rising' if trend_change[i] > 0 else 'falling'} {trend_change[i] * 100:+.2f}% over {self.trend_hours}h")
+            alerts.append(Alert(names[i], float(baseline[i]), float(current[i]), float(change[i]), float(zscore[i]), reasons))
+
+        await self.repo.write(save_alert_state, [
+            (name, prices[name], now if fire[i] else None) for i, name in enumerate(names)
+        ])
+        return alerts
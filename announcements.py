@@ -0,0 +1,45 @@
+import asyncio
+
+from rate_limit import TokenBucket
+
+ANNOUNCED_SQL = "SELECT guild_id FROM startup_announcements WHERE version = ?"
+
+
+def record_announcements(conn, guild_ids, version, now):
+    """Writer-side: remember which guilds have seen this version's announcement"""
+    conn.executemany("""
+        INSERT INTO startup_announcements (guild_id, version, announced_at) VALUES (?, ?, ?)
+        ON CONFLICT (guild_id) DO UPDATE SET version = excluded.version, announced_at = excluded.announced_at
+    """, [(guild_id, version, now) for guild_id in guild_ids])
+
+
+def announcement_channel(guild):
+    """The guild's system channel if the bot may post there, else the first text channel it may post in"""
+    me = guild.me
+    candidates = ([guild.system_channel] if guild.system_channel else []) + list(guild.text_channels)
+    for channel in candidates:
+        if me is None or channel.permissions_for(me).send_messages:
+            return channel
+    return None
+
+
+async def broadcast(guilds, send, rate=5.0, burst=5, concurrency=8):
+    """Call `send(guild)` for every guild concurrently, paced by a token bucket
+
+    Returns the ids of the guilds that were sent to; failures are logged and left for the next start.
+    """
+    bucket = TokenBucket(rate, burst)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(guild):
+        await bucket.acquire()
+        async with semaphore:
+            try:
+                await send(guild)
+                return guild.id
+            except Exception as e:
+                print(f"❌ Failed to announce in guild {guild.id}: {e}")
+                return None
+
+    results = await asyncio.gather(*(one(guild) for guild in guilds))
+    return [guild_id for guild_id in results if guild_id is not None]
@@ -0,0 +1,41 @@
+"""Minimal stand-ins for the py-cord objects slash commands and autocomplete touch"""
+from types import SimpleNamespace
+
+
+class FakeFollowup:
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    async def send(self, content=None, **kwargs):
+        self.ctx.responses.append((content, kwargs))
+
+
+class FakeContext:
+    """Records what a command responds with instead of calling Discord"""
+
+    def __init__(self, user_id=1, guild_id=1, channel_id=1):
+        self.author = SimpleNamespace(id=user_id, mention=f"<@{user_id}>")
+        self.guild = SimpleNamespace(id=guild_id)
+        self.channel = SimpleNamespace(id=channel_id, mention=f"<#{channel_id}>")
+        self.followup = FakeFollowup(self)
+        self.responses = []
+        self.deferred = False
+
+    async def defer(self, *args, **kwargs):
+        self.deferred = True
+
+    async def respond(self, content=None, **kwargs):
+        self.responses.append((content, kwargs))
+
+    send = respond
+
+    @property
+    def failed(self):
+        """True when the command answered with an error message"""
+        return any(isinstance(content, str) and content.startswith("❌") for content, _ in self.responses)
+
+
+class FakeAutocompleteContext:
+    def __init__(self, value):
+        self.value = value
+        self.options = {}
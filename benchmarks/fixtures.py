@@ -0,0 +1,112 @@
+"""UEX API fixtures for the benchmark stub
+
+Recorded fixtures (benchmarks/fixtures/commodities.json and commodities_prices.json) are used
+when present; otherwise a deterministic synthetic market of the same shape is generated.
+Record from the live API with:
+
+    python -m benchmarks.fixtures --record
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+SYSTEMS = {"Stanton": ["Hurston", "Crusader", "ArcCorp", "microTech"], "Pyro": ["Pyro I", "Monox", "Bloom"]}
+FACTIONS = ["United Empire of Earth", "Crusader Industries", "Headhunters", "Citizens for Prosperity"]
+WORDS = ["Agricium", "Aluminum", "Beryl", "Copper", "Corundum", "Diamond", "Gold", "Hephaestanite", "Iron",
+         "Laranite", "Quantanium", "Quartz", "Taranite", "Titanium", "Tungsten", "Medical Supplies",
+         "Processed Food", "Scrap", "Waste", "Stims", "Distilled Spirits", "Fluorine", "Hydrogen", "Iodine"]
+
+
+def synthetic_market(commodities=120, terminals=80, seed=1234):
+    """(commodities payload rows, {commodity name: commodities_prices rows})"""
+    rng = random.Random(seed)
+    names = []
+    for i in range(commodities):
+        base = WORDS[i % len(WORDS)]
+        names.append(base if i < len(WORDS) else f"{base} ({'Raw' if i % 2 else 'Refined'} {i // len(WORDS)})")
+
+    sites = []
+    for t in range(terminals):
+        system = rng.choice(list(SYSTEMS))
+        sites.append({
+            "id_terminal": t + 1,
+            "terminal_name": f"Terminal {t + 1:03d}",
+            "star_system_name": system,
+            "planet_name": rng.choice(SYSTEMS[system]),
+            "city_name": rng.choice([None, "Lorville", "Area18", "New Babbage", "Orison", "Ruin Station"]),
+            "faction_name": rng.choice(FACTIONS),
+        })
+
+    rows, prices = [], {}
+    for c, name in enumerate(names):
+        base = rng.uniform(2, 300)
+        rows.append({
+            "id": c + 1,
+            "name": name,
+            "code": f"C{c + 1:03d}",
+            "price_buy": round(base, 2),
+            "price_sell": round(base * rng.uniform(1.05, 1.4), 2),
+            "weight_scu": rng.choice([1, 1, 1, 2]),
+        })
+        prices[name] = []
+        for site in rng.sample(sites, rng.randint(3, 15)):
+            sells, buys = rng.random() < 0.5, rng.random() < 0.7
+            prices[name].append(dict(site, **{
+                "id_commodity": c + 1,
+                "commodity_name": name,
+                "price_buy": round(base * rng.uniform(0.8, 1.1), 2) if sells else 0,
+                "price_sell": round(base * rng.uniform(1.0, 1.5), 2) if buys or not sells else 0,
+                "scu_buy": rng.randint(0, 5000) if sells else 0,
+                "scu_sell": rng.randint(0, 5000),
+            }))
+    return rows, prices
+
+
+def load_market():
+    """Recorded fixtures if present, else the synthetic market"""
+    commodities_path = os.path.join(FIXTURE_DIR, "commodities.json")
+    prices_path = os.path.join(FIXTURE_DIR, "commodities_prices.json")
+    if os.path.exists(commodities_path) and os.path.exists(prices_path):
+        with open(commodities_path, encoding="utf-8") as f:
+            rows = json.load(f)
+        with open(prices_path, encoding="utf-8") as f:
+            prices = json.load(f)
+        return rows, prices
+    return synthetic_market()
+
+
+async def record(limit=None):
+    from uex_client import UEXClient
+
+    client = UEXClient()
+    try:
+        rows = (await client.commodities())["data"]
+        prices = {}
+        for row in rows[:limit]:
+            data = await client.commodity_prices(row["name"])
+            prices[row["name"]] = data.get("data") or []
+    finally:
+        await client.close()
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    with open(os.path.join(FIXTURE_DIR, "commodities.json"), "w", encoding="utf-8") as f:
+        json.dump(rows, f)
+    with open(os.path.join(FIXTURE_DIR, "commodities_prices.json"), "w", encoding="utf-8") as f:
+        json.dump(prices, f)
+    print(f"✅ Recorded {len(rows)} commodities and {sum(map(len, prices.values()))} terminal prices to {FIXTURE_DIR}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record UEX fixtures for the benchmark stub")
+    parser.add_argument("--record", action="store_true", help="fetch fixtures from the live UEX API")
+    parser.add_argument("--limit", type=int, default=None, help="only record prices for the first N commodities")
+    args = parser.parse_args()
+    if args.record:
+        asyncio.run(record(args.limit))
+    else:
+        rows, prices = load_market()
+        print(f"{len(rows)} commodities, {sum(map(len, prices.values()))} terminal prices")
@@ -0,0 +1,252 @@
+"""Offline benchmarks for the slash commands, autocomplete and the ingest cycle
+
+    python -m benchmarks.run                      # run everything, compare with the baseline
+    python -m benchmarks.run --users 50 autocomplete commodity
+    python -m benchmarks.run --save-baseline      # store this run as the new baseline
+
+Everything runs against a local UEX stub and a throwaway database, with seeded randomness,
+so runs on the same machine are comparable.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+# Keep the bot from posting alerts, serving metrics or logging cold starts while benchmarking
+os.environ["ALERT_CHANNEL_ID"] = "0"
+os.environ["APT_METRICS_PORT"] = "0"
+os.environ["APT_STARTUP_LOG"] = ""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_discord import FakeAutocompleteContext, FakeContext
+from benchmarks.uex_stub import UEXStub
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class Bench:
+    """Sets up the bot modules against the stub and runs scenarios as N concurrent users"""
+
+    def __init__(self, stub, seed):
+        self.stub = stub
+        self.seed = seed
+        self.bot = None
+        self.names = []
+        self.terminals = []
+
+    async def setup(self, workdir):
+        import database
+        database.DB_PATH = os.path.join(workdir, "bench.db")
+
+        import bot
+        from rate_limit import TokenBucket
+        bot.uex.base_url = self.stub.url
+        # Measure our own pipeline, not the 2 req/s courtesy limit the client applies to the real API
+        bot.uex._bucket = TokenBucket(10_000, 10_000)
+        self.bot = bot
+
+        await bot.repo.open()
+        for _ in range(3):  # a little history for alerts and trends
+            await bot.ingest.run_once()
+        await bot.fetch_terminal_prices()
+        self.names = sorted(await bot.repo.commodity_names())
+        self.terminals = bot.route_engine.terminal_names()
+
+    async def teardown(self):
+        await self.bot.uex.close()
+        await self.bot.repo.close()
+        self.bot.chart_renderer.shutdown()
+
+    # --- Scenarios: one operation each; return a FakeContext for commands --------
+
+    async def ingest(self, rng):
+        await self.bot.ingest.run_once()
+
+    async def autocomplete(self, rng):
+        name = rng.choice(self.names)
+        prefix = name[:rng.randint(1, 4)].lower() if rng.random() < 0.8 else name[1:4].lower()
+        await self.bot.commodity_autocomplete(FakeAutocompleteContext(prefix))
+
+    async def commodity(self, rng):
+        ctx = FakeContext()
+        await self.bot.commodity.callback(ctx, rng.choice(self.names))
+        return ctx
+
+    async def best_locations(self, rng):
+        ctx = FakeContext()
+        await self.bot.best_locations.callback(ctx, name=rng.choice(self.names))
+        return ctx
+
+    async def cargo_manifest(self, rng):
+        ctx = FakeContext()
+        await self.bot.cargo_manifest.callback(ctx, rng.choice(self.names), rng.randint(1, 500))
+        return ctx
+
+    async def cargo_plan(self, rng):
+        ctx = FakeContext()
+        cargo = ", ".join(f"{name} {rng.randint(10, 2000)}" for name in rng.sample(self.names, rng.randint(2, 6)))
+        await self.bot.cargo_plan.callback(ctx, cargo, rng.choice([None, 2, 3, 5]))
+        return ctx
+
+    async def trade_route(self, rng):
+        ctx = FakeContext()
+        start = rng.choice(self.terminals) if self.terminals and rng.random() < 0.5 else None
+        await self.bot.trade_route.callback(ctx, rng.choice([32, 96, 576]), rng.choice([10_000, 100_000, 1_000_000]),
+                                            rng.randint(2, 4), start)
+        return ctx
+
+    async def market_trend(self, rng):
+        ctx = FakeContext()
+        await self.bot.market_trends.callback(ctx, rng.choice(self.names[:20]))
+        return ctx
+
+    SCENARIOS = ("ingest", "autocomplete", "commodity", "best_locations", "cargo_manifest", "cargo_plan", "trade_route", "market_trend")
+    SEQUENTIAL = {"ingest"}  # one ingest at a time, as in production
+
+    async def run(self, scenario, users, iterations, warmup=1):
+        operation = getattr(self, scenario)
+        users = 1 if scenario in self.SEQUENTIAL else users
+        latencies, errors = [], 0
+
+        async def user(index):
+            nonlocal errors
+            rng = random.Random(f"{self.seed}:{scenario}:{index}")
+            for i in range(warmup + iterations):
+                start = time.perf_counter()
+                try:
+                    ctx = await operation(rng)
+                    failed = ctx is not None and ctx.failed
+                except Exception:
+                    failed = True
+                elapsed = time.perf_counter() - start
+                if i >= warmup:
+                    latencies.append(elapsed)
+                    errors += failed
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(users)))
+        wall = time.perf_counter() - start
+        return {
+            "users": users,
+            "ops": len(latencies),
+            "errors": errors,
+            "throughput": len(latencies) / wall if wall else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "mean_ms": sum(latencies) / len(latencies) * 1000,
+        }
+
+
+def compare(results, baseline, threshold):
+    """Print per-scenario deltas; returns the scenarios that regressed by more than `threshold`"""
+    regressions = []
+    print(f"\n{'scenario':<16}{'p50 Δ':>10}{'p99 Δ':>10}{'ops/s Δ':>10}")
+    for scenario, result in results.items():
+        base = baseline.get(scenario)
+        if not base:
+            print(f"{scenario:<16}{'(new)':>10}")
+            continue
+        deltas = {
+            "p50": result["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0.0,
+            "p99": result["p99_ms"] / base["p99_ms"] - 1 if base["p99_ms"] else 0.0,
+            "throughput": 1 - result["throughput"] / base["throughput"] if base["throughput"] else 0.0,
+        }
+        flag = ""
+        if any(delta > threshold for delta in deltas.values()):
+            regressions.append(scenario)
+            flag = "  ⚠️ regression"
+        print(f"{scenario:<16}{deltas['p50']:>+10.0%}{deltas['p99']:>+10.0%}{-deltas['throughput']:>+10.0%}{flag}")
+    return regressions
+
+
+async def main(args):
+    stub = UEXStub(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    await stub.start()
+    bench = Bench(stub, args.seed)
+    scenarios = args.scenarios or Bench.SCENARIOS
+
+    # The bot's own progress prints would drown the table
+    devnull = open(os.devnull, "w")
+    quiet = contextlib.nullcontext if args.verbose else lambda: contextlib.redirect_stdout(devnull)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with quiet():
+            await bench.setup(workdir)
+        results = {}
+        try:
+            print(f"{'scenario':<16}{'users':>6}{'ops':>7}{'err':>5}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+            for scenario in scenarios:
+                with quiet():
+                    result = await bench.run(scenario, args.users, args.iterations)
+                results[scenario] = result
+                print(f"{scenario:<16}{result['users']:>6}{result['ops']:>7}{result['errors']:>5}"
+                      f"{result['throughput']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+        finally:
+            with quiet():
+                await bench.teardown()
+            await stub.stop()
+            devnull.close()
+
+    report = {
+        "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "fail_on_regression", "verbose")},
+        "results": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, "latest.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Baseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("users") != args.users:
+            print(f"\n⚠️ Baseline was recorded with {baseline['config'].get('users')} users; deltas are not like for like.")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario", help=f"scenarios to run (default: all of {', '.join(Bench.SCENARIOS)})")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=50, help="operations per user after warm-up")
+    parser.add_argument("--latency", type=float, default=0.0, help="stub latency per UEX request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random stub latency (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of UEX requests that fail")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file to compare against or save")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown counted as a regression")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own log output")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 when a scenario regresses")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(Bench.SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,104 @@
+"""Local stand-in for the UEX API serving fixtures with configurable latency and errors
+
+    python -m benchmarks.uex_stub --port 8765 --latency 0.05 --error-rate 0.02
+
+then point the bot at it with UEX_API_BASE=http://127.0.0.1:8765.
+"""
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+from benchmarks.fixtures import load_market
+
+
+class UEXStub:
+    """Serves /commodities and /commodities_prices from fixtures
+
+    latency/jitter are seconds added to every response; error_rate is the fraction of requests
+    answered with HTTP 503. Each /commodities call drifts `drift` of the prices so change-only
+    ingestion has work to do. All randomness comes from one seeded RNG.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, drift=0.1, seed=1234, market=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drift = drift
+        self.rng = random.Random(seed)
+        self.commodities, self.prices = market or load_market()
+        self.by_id = {row["id"]: row["name"] for row in self.commodities if "id" in row}
+        self.requests = 0
+        self.errors = 0
+        self._runner = None
+        self.url = None
+
+    async def _respond(self, payload):
+        self.requests += 1
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"status": "error", "message": "stubbed failure"}, status=503)
+        return web.json_response(payload)
+
+    async def handle_commodities(self, request):
+        for row in self.commodities:
+            if self.rng.random() < self.drift and row.get("price_sell"):
+                factor = self.rng.uniform(0.95, 1.05)
+                row["price_sell"] = round(row["price_sell"] * factor, 2)
+                row["price_buy"] = round(row["price_buy"] * factor, 2)
+        return await self._respond({"status": "ok", "data": self.commodities})
+
+    async def handle_commodity_prices(self, request):
+        name = request.query.get("commodity_name")
+        if name is None and request.query.get("id_commodity", "").isdigit():
+            name = self.by_id.get(int(request.query["id_commodity"]))
+        return await self._respond({"status": "ok", "data": self.prices.get(name, [])})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/commodities", self.handle_commodities)
+        app.router.add_get("/commodities_prices", self.handle_commodity_prices)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving; returns the base URL (port 0 picks a free port)"""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _serve(args):
+    stub = UEXStub(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    url = await stub.start(args.host, args.port)
+    print(f"✅ UEX stub serving {len(stub.commodities)} commodities at {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve UEX fixtures locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=1234)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
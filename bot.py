@@ -1,134 +1,235 @@
+from startup_profile import startup
 import os
-from dotenv import load_dotenv
-import discord
-import matplotlib.pyplot as plt
-import requests
-import aiohttp
-from discord.ext import commands, tasks
 import asyncio
-import sqlite3
+import re
 import datetime
+import time
 import io
+import tempfile
 from io import BytesIO
 import traceback
-import pandas as pd
-from discord import Option
-import aiosqlite
+
+# Heavy dependencies (pandas, matplotlib) are not imported here; charts are drawn in chart_renderer's workers
+with startup.importing("dotenv"):
+    from dotenv import load_dotenv
+with startup.importing("discord"):
+    import discord
+    from discord.ext import commands, tasks
+    from discord import Option
+with startup.importing("bot modules"):
+    from commodity_index import CommodityIndex
+    from uex_client import UEXClient, UEXError, CircuitOpenError
+    from ingest import IngestPipeline
+    from price_cache import AsyncTTLCache
+    from chart_renderer import ChartRenderer, render_trend_chart
+    from repository import Repository
+    from trade_routes import TradeRouteEngine
+    from cargo_sales import parse_cargo, plan_sales
+    import export
+    from price_history import PriceHistory, HISTORY_SQL, HISTORY_SINCE_SQL, WINDOW_DAYS
+    from terminal_prices import TerminalPriceJob
+    from alerts import AlertEngine
+    from alert_dispatch import AlertDispatcher, load_subscriptions, subscribe, unsubscribe, GUILD_SUBSCRIPTIONS_SQL
+    from announcements import ANNOUNCED_SQL, record_announcements, announcement_channel, broadcast
+    import metrics
+    import profiling
+    from cluster import Cluster
+    import organizations as org_queries
+    from leaderboard import Leaderboards, ORG_POINTS_SQL
+    from organizations import (create_organization, join_organization, award_points, leave_organization,
+                               create_role, assign_role, set_income_share)
 
 
 load_dotenv()
 
 TOKEN = os.getenv("DISCORD_TOKEN")
-API_URL_COMMODITIES = "https://api.uexcorp.space/2.0/commodities"
-API_URL_PRICES = "https://api.uexcorp.space/2.0/commodities_prices?id_commodity={}"
 
-# Function to fetch commodity names from the database
+# Shared UEX API client (one keep-alive pool, rate limited, retried)
+uex = UEXClient()
+
+# Per-commodity terminal prices for /best_locations and /cargo_manifest;
+# concurrent lookups for the same commodity share one upstream call
+terminal_price_cache = AsyncTTLCache(uex.commodity_prices, ttl=120, stale_ttl=600, maxsize=128)
+
+# Off-loop chart rendering with an in-memory PNG cache
+chart_renderer = ChartRenderer()
+
+# Resident name index, rebuilt after each ingest (see refresh_caches)
+commodity_index = CommodityIndex()
+
+# Last 7 days of commodity prices in fixed-size ring buffers, for /commodity and /market_trend;
+# rebuilt from the database at warm-up and synced after every ingest (see load_price_history)
+price_history = PriceHistory()
+
+# Terminal x commodity price matrix for /trade_route, rebuilt after each terminal sweep,
+# plus a name index for picking the start terminal
+route_engine = TradeRouteEngine()
+terminal_index = CommodityIndex()
+
+# Async data access: pooled readers and a single serialized writer
+repo = Repository()
+
+# Only the process holding the "pollers" lease polls UEX and writes prices; the others
+# refresh their caches when the leader notifies them (see the cluster handlers below)
+async def run_pollers(is_leader):
+    for loop in (fetch_commodity_prices, fetch_terminal_prices):
+        if is_leader and not loop.is_running():
+            loop.start()
+        elif not is_leader and loop.is_running():
+            loop.cancel()
+
+cluster = Cluster(repo, run_pollers)
+
+# Per-organization points rankings, loaded on first use and updated in place by /award_points
+async def load_org_points(org_name):
+    return await repo.fetchall(ORG_POINTS_SQL, (org_name,), name="org_points") or None
+
+leaderboards = Leaderboards(load_org_points)
+
+# Function to fetch commodity names from the database (used to warm the index on startup)
 async def fetch_commodity_names():
-    conn = sqlite3.connect('organizations.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT commodity_name FROM commodity_prices")
-    commodities = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return commodities
+    return await repo.commodity_names()
 
 # Universal Autocomplete Function
 async def commodity_autocomplete(ctx: discord.AutocompleteContext):
-    commodities = await fetch_commodity_names()
-    return [c for c in commodities if ctx.value.lower() in c.lower()]
+    return commodity_index.search(ctx.value)
+
+async def terminal_autocomplete(ctx: discord.AutocompleteContext):
+    return terminal_index.search(ctx.value)
     
 intents = discord.Intents.default()
 intents.messages = True
 intents.message_content = True
-# Database setup
-def setup_db():
-    conn = sqlite3.connect('organizations.db')
-    cursor = conn.cursor()
-
-    # Create tables for organizations, members, and ranks
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS organizations (
-        org_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        org_name TEXT,
-        description TEXT,
-        leader_id INTEGER
-    )
-    ''')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS members (
-        user_id INTEGER,
-        org_name TEXT,
-        role TEXT,
-        points INTEGER,
-        PRIMARY KEY (user_id, org_name),
-        FOREIGN KEY (org_name) REFERENCES organizations(org_name)
-    )
-    ''')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS ranks (
-        rank_name TEXT,
-        org_name TEXT,
-        PRIMARY KEY (rank_name, org_name),
-        FOREIGN KEY (org_name) REFERENCES organizations(org_name)
-    )
-    ''')
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS roles (
-        org_name TEXT,
-        role_name TEXT,
-        income_share REAL DEFAULT 0,
-        PRIMARY KEY (org_name, role_name)
-    )
-""")
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS commodity_prices (
-        id INTEGER PRIMARY KEY,
-        commodity_name TEXT NOT NULL,
-        price_buy REAL,
-        price_sell REAL,
-        weight_scu INTEGER,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    cursor.execute('''\
-    CREATE TABLE IF NOT EXISTS settings (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        guild_id INTEGER,
-        channel_id INTEGER
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
 
-#Database End
-
-bot = commands.Bot(command_prefix="/", intents=intents)
-
-#define alert channel
-ALERT_CHANNEL_ID = 1334357654906212364
-
-#define previous Data
-previous_prices = {}
-ALERT_THRESHOLD = 0.05
+BOT_VERSION = "V1"
+
+# Post the "ready" embed to each guild once per BOT_VERSION (off unless APT_ANNOUNCE_STARTUP=1)
+ANNOUNCE_STARTUP = os.getenv("APT_ANNOUNCE_STARTUP", "0") == "1"
+
+# Sharding: APT_SHARD_COUNT total shards, APT_SHARD_IDS the ones this process runs (e.g. "0,1").
+# Unset runs one unsharded process; every process shares organizations.db and one leader polls UEX.
+SHARD_COUNT = int(os.getenv("APT_SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(i) for i in os.getenv("APT_SHARD_IDS", "").split(",") if i.strip()] or None
+SHARDED = SHARD_COUNT is not None or SHARD_IDS is not None
+
+class APTBot(commands.AutoShardedBot if SHARDED else commands.Bot):
+    """Bot with a run-once lifecycle
+
+    on_ready fires again after every gateway reconnect, so one-time work lives here instead:
+    the database and caches are warmed in start() before the bot logs in and serves commands,
+    and close() stops the loops and releases the shared clients and pools.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.initialized = False
+        self.announced = False
+        self.metrics_runner = None
+
+    async def start(self, token, *, reconnect=True):
+        if not self.initialized:
+            await warm_up()
+            self.initialized = True
+        await super().start(token, reconnect=reconnect)
+
+    async def invoke_application_command(self, ctx):
+        name = ctx.command.qualified_name
+        profile_token = command_profiler.enter(name)
+        start = time.perf_counter()
+        try:
+            await super().invoke_application_command(ctx)
+        finally:
+            status = "error" if getattr(ctx, "command_failed", False) else "ok"
+            metrics.command_seconds.observe(time.perf_counter() - start, command=name, status=status)
+            if profile_token is not None:
+                command_profiler.exit(profile_token)
+
+    async def close(self):
+        # Stop electing first: a lease tick after the cancel would start the pollers again
+        if repo.is_open:
+            await cluster.stop()
+        for loop in (fetch_commodity_prices, fetch_terminal_prices):
+            loop.cancel()
+        await super().close()
+        if loop_monitor is not None:
+            await loop_monitor.stop()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+            self.metrics_runner = None
+        await uex.close()
+        await repo.close()
+        chart_renderer.shutdown()
+
+shard_options = {"shard_count": SHARD_COUNT, "shard_ids": SHARD_IDS} if SHARDED else {}
+bot = APTBot(command_prefix="/", intents=intents, **shard_options)
+
+# Opt-in loop lag / stall monitor (APT_PROFILE=1) and the on-demand /profile sampler
+loop_monitor = profiling.LoopMonitor() if profiling.PROFILE_ENABLED else None
+command_profiler = profiling.CommandProfiler()
+
+#define alert channel (receives every alert on top of the per-guild subscriptions; 0 disables)
+ALERT_CHANNEL_ID = int(os.getenv("ALERT_CHANNEL_ID", "1334357654906212364"))
+
+#define alert rules (5% move per check, 3σ vs the 24h average, 4h sustained trend, 1h cooldown)
+alert_engine = AlertEngine(repo, pct_threshold=0.05, z_threshold=3.0, trend_hours=4, cooldown_minutes=60)
+
+async def send_alert(channel_id, content):
+    channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+    await channel.send(content)
+
+# Alert fan-out: one outbox per subscribed channel, paced to Discord's per-channel and global limits
+alert_dispatcher = AlertDispatcher(send_alert)
+
+# Cache and queue state, read at scrape time
+metrics.registry.gauge("apt_cache_hit_ratio", "Cache hit ratio since start", lambda: {
+    ("terminal_prices",): terminal_price_cache.stats()["hit_rate"],
+    ("charts",): chart_renderer.hits / max(chart_renderer.hits + chart_renderer.misses, 1),
+}, ("cache",))
+metrics.registry.gauge("apt_cache_lookups", "Cache lookups since start", lambda: {
+    ("terminal_prices", "hit"): terminal_price_cache.hits,
+    ("terminal_prices", "stale_hit"): terminal_price_cache.stale_hits,
+    ("terminal_prices", "miss"): terminal_price_cache.misses,
+    ("charts", "hit"): chart_renderer.hits,
+    ("charts", "miss"): chart_renderer.misses,
+}, ("cache", "result"))
+metrics.registry.gauge("apt_alert_messages", "Alert messages sent or dropped since start", lambda: {
+    ("sent",): alert_dispatcher.sent,
+    ("failed",): alert_dispatcher.failed,
+}, ("result",))
+metrics.registry.gauge("apt_price_history_bytes", "Memory held by the resident price history", lambda: price_history.nbytes)
+metrics.registry.gauge("apt_ingest_version", "Completed ingest cycles", lambda: ingest.version)
+metrics.registry.gauge("apt_uex_circuit_state", "UEX circuit breaker state (0 closed, 1 half-open, 2 open)",
+                       lambda: {"closed": 0, "half_open": 1, "open": 2}[uex.breaker.state])
+metrics.registry.gauge("apt_cluster_leader", "1 while this process holds the pollers lease", lambda: int(cluster.is_leader))
+metrics.registry.gauge("apt_uex_circuit_trips", "Times the UEX circuit breaker has opened", lambda: uex.breaker.trips)
+
+# One-time initialization, run before login so the first command already sees warm data
+async def warm_up():
+    await repo.open()
+    commodity_index.rebuild(await fetch_commodity_names())
+    await load_price_history()
+    await rebuild_route_matrix()
+    bot.metrics_runner = await metrics.start_server(routes=cluster.routes)
+    if cluster.peer_url and bot.metrics_runner is None:
+        # Nothing would answer at APT_PEER_URL (or worse, another process on the same port would)
+        print(f"⚠️ APT_PEER_URL is set to {cluster.peer_url} but the metrics endpoint isn't running; "
+              "not registering as a peer, so this process won't hear about price changes. "
+              "Give every process its own free APT_METRICS_PORT.")
+        cluster.peer_url = None
+    cluster.start()  # the pollers start once this process wins the lease (see run_pollers)
+    if loop_monitor is not None:
+        loop_monitor.start()
+    startup.mark("warm-up")
 
 @bot.event
 async def on_ready():
-    print(f"✅ Logged in as {bot.user}, V1")
-    setup_db()
-    # Run the initial fetch on startup
-    # await fetch_initial_commodity_data()
+    print(f"✅ Logged in as {bot.user}, {BOT_VERSION}")
+    startup.mark("on_ready")
+    if ANNOUNCE_STARTUP and not bot.announced:
+        bot.announced = True
+        asyncio.create_task(announce_startup())
 
-    if not check_commodity_prices.is_running():
-        check_commodity_prices.start()
-
-    if not fetch_commodity_prices.is_running():
-        fetch_commodity_prices.start()
-    
-    # Create an embed for the message
+def startup_embed():
     embed = discord.Embed(
         title="🤖 A.P.T - Automated Personal Trader", 
         description="I am ready to assist with your trading needs!", 
@@ -142,223 +243,168 @@ async def on_ready():
         embed.set_footer(text="Powered by A.P.T", icon_url=bot.user.avatar.url)
     else:
         embed.set_footer(text="Powered by A.P.T")
+    return embed
+
+# Announce to every guild that hasn't seen this version yet, concurrently and rate limited
+async def announce_startup():
+    seen = {row[0] for row in await repo.fetchall(ANNOUNCED_SQL, (BOT_VERSION,))}
+    channels = {guild.id: announcement_channel(guild) for guild in bot.guilds if guild.id not in seen}
+    pending = [guild for guild in bot.guilds if channels.get(guild.id) is not None]
+    if not pending:
+        return
 
-    for guild in bot.guilds:
-        # Get the first text channel available
-        for channel in guild.text_channels:
-            # Send the startup message
-            await channel.send(embed=embed)
-            break  # Stop after sending the message to the first text channel
-
-#Database Functions
-# Function to create an organization
-def create_organization(org_name, description, leader_id):
-    conn = sqlite3.connect('organizations.db')
-    cursor = conn.cursor()
-
-    # Insert the organization into the database
-    cursor.execute('''
-    INSERT INTO organizations (org_name, description, leader_id) VALUES (?, ?, ?)
-    ''', (org_name, description, leader_id))
-
-    # Create default ranks for the organization (Leader, Officer, Member)
-    cursor.execute('''
-    INSERT INTO ranks (rank_name, org_name) VALUES
-    ('Leader', ?),
-    ('Officer', ?),
-    ('Member', ?)
-    ''', (org_name, org_name, org_name))
-
-# Insert the creator as a member with the 'Leader' rank
-    cursor.execute('''
-    INSERT INTO members (user_id, org_name, role, points) VALUES (?, ?, ?, ?)
-    ''', (leader_id, org_name, 'Leader', 0))  # Assuming points start at 0
-
-    conn.commit()
-    conn.close()
-
-# Function to join an organization
-def join_organization(user_id, org_name):
-    conn = sqlite3.connect('organizations.db')
-    cursor = conn.cursor()
-
-    # Check if the organization exists
-    cursor.execute('SELECT * FROM organizations WHERE org_name = ?', (org_name,))
-    if cursor.fetchone() is None:
-        conn.close()
-        return f"❌ The organization `{org_name}` does not exist."
-
-    # Check if the user is already a member
-    cursor.execute('SELECT * FROM members WHERE user_id = ? AND org_name = ?', (user_id, org_name))
-    if cursor.fetchone() is not None:
-        conn.close()
-        return f"❌ You are already a member of `{org_name}`."
-
-    # Add the user as a member with the default role "Member"
-    cursor.execute('''
-    INSERT INTO members (user_id, org_name, role, points) VALUES (?, ?, ?, ?)
-    ''', (user_id, org_name, "Member", 0))
-
-    conn.commit()
-    conn.close()
-    return f"✅ You have joined the organization `{org_name}` as a Member!"
-
-# Function to award points to a member
-def award_points(user_id, member_id, org_name, points):
-    conn = sqlite3.connect('organizations.db')
-    cursor = conn.cursor()
-
-    # Check if the organization exists
-    cursor.execute('SELECT * FROM organizations WHERE org_name = ?', (org_name,))
-    if cursor.fetchone() is None:
-        conn.close()
-        return f"❌ The organization `{org_name}` does not exist."
-
-    # Check if both the user and member are in the organization
-    cursor.execute('SELECT * FROM members WHERE user_id = ? AND org_name = ?', (user_id, org_name))
-    if cursor.fetchone() is None:
-        conn.close()
-        return f"❌ You are not a member of `{org_name}`."
-
-    cursor.execute('SELECT * FROM members WHERE user_id = ? AND org_name = ?', (member_id, org_name))
-    if cursor.fetchone() is None:
-        conn.close()
-        return f"❌ The member is not a member of `{org_name}`."
-
-    # Award points
-    cursor.execute('''
-    UPDATE members SET points = points + ? WHERE user_id = ? AND org_name = ?
-    ''', (points, member_id, org_name))
-
-    conn.commit()
-    conn.close()
-    return f"✅ {points} points awarded to the member in `{org_name}`."
-    # Function to leave an organization
-def leave_organization(user_id, org_name):
-    conn = sqlite3.connect('organizations.db')
-    cursor = conn.cursor()
-
-    # Check if the user is in the organization
-    cursor.execute('SELECT * FROM members WHERE user_id = ? AND org_name = ?', (user_id, org_name))
-    if cursor.fetchone() is None:
-        conn.close()
-        return f"❌ You are not a member of `{org_name}`."
-
-    # Remove the user from the organization
-    cursor.execute('DELETE FROM members WHERE user_id = ? AND org_name = ?', (user_id, org_name))
-
-    # Check if the organization has any remaining members
-    cursor.execute('SELECT COUNT(*) FROM members WHERE org_name = ?', (org_name,))
-    remaining_members = cursor.fetchone()[0]
-
-    # If no members remain, delete the organization
-    if remaining_members == 0:
-        cursor.execute('DELETE FROM organizations WHERE org_name = ?', (org_name,))
-        cursor.execute('DELETE FROM ranks WHERE org_name = ?', (org_name,))
-        conn.commit()
-        conn.close()
-        return f"⚠️ You were the last member. Organization `{org_name}` has been deleted."
-
-    conn.commit()
-    conn.close()
-    return f"✅ You have successfully left `{org_name}`."
-# Database Function End
-
-#task to check commodity prices periodically
-@tasks.loop(minutes=10)
-async def check_commodity_prices():
-    try:
-        response = requests.get(API_URL_COMMODITIES)
-        data = response.json()
-        print("✅Getting Commodity Prices.")
-
-        if data["status"] != "ok" or not data["data"]:
-            print("❌ Error: Unable to fetch commodity data.")
-            return
-
-        commodities = data["data"]
-        alerts = []
-
-        for commodity in commodities:
-            name = commodity["name"]
-            current_price = commodity["price_sell"]
-
-            # Check if current price is valid
-            if current_price is None or current_price <= 0:
-                continue  # Skip invalid price
-
-            # Compare the current price with the previous price
-            if name in previous_prices:
-                previous_price = previous_prices[name]
-                price_change = (current_price - previous_price) / previous_price
-
-                if abs(price_change) >= ALERT_THRESHOLD:
-                    alerts.append((name, previous_price, current_price, price_change))
+    embed = startup_embed()
+    sent = await broadcast(pending, lambda guild: channels[guild.id].send(embed=embed))
+    now = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    await repo.write(record_announcements, sent, BOT_VERSION, now)
+    print(f"✅ Announced startup in {len(sent)}/{len(pending)} guilds.")
+
+
+#Ingestion: one /commodities fetch per cycle, fanned out to the consumers below
+ingest = IngestPipeline(uex)
+
+# Consumer 1: store the snapshot in the database (one transaction, changed prices only)
+@ingest.consumer
+async def write_commodity_prices(snapshot):
+    rows = [(c["name"], c["price_buy"], c["price_sell"], c.get("weight_scu")) for c in snapshot.priced()]
+    now = snapshot.fetched_at.strftime("%Y-%m-%d %H:%M:%S")
+
+    inserted, unchanged = await repo.store_commodity_prices(rows, now)
+    print(f"✅ Stored {len(rows)} commodity prices ({inserted} changed, {unchanged} unchanged).")  # Debug log
+
+# Consumer 2: evaluate alert rules once per batch and queue them for every subscribed channel
+@ingest.consumer
+async def detect_price_alerts(snapshot):
+    alerts = await alert_engine.evaluate(snapshot)
+
+    if alerts:
+        subscriptions = await load_subscriptions(repo, (alert.name for alert in alerts))
+        fallback = (ALERT_CHANNEL_ID,) if ALERT_CHANNEL_ID else ()
+        queued = alert_dispatcher.dispatch(alerts, subscriptions, fallback_channels=fallback)
+        print(f"✅ Queued {queued} alert message(s) for {len(alerts)} alert(s).")
+
+# Consumer 3: refresh in-memory caches derived from the snapshot
+@ingest.consumer
+async def refresh_caches(snapshot):
+    commodity_index.rebuild(c["name"] for c in snapshot.priced())
+    await load_price_history(incremental=True)
+    # Prices moved upstream; revalidate terminal prices on next access
+    terminal_price_cache.invalidate()
+
+# Consumer 4: tell follower processes the stored prices changed
+@ingest.consumer
+async def notify_followers(snapshot):
+    await cluster.notify("commodities")
+
+# Follower side of the notifications: rebuild from the database the leader just wrote
+@cluster.on_notification("commodities")
+async def on_commodities_ingested(payload):
+    commodity_index.rebuild(await fetch_commodity_names())
+    await load_price_history(incremental=True)
+    terminal_price_cache.invalidate()
+    ingest.version += 1  # new chart cache keys, as after a local ingest
+
+@cluster.on_notification("terminals")
+async def on_terminals_swept(payload):
+    await rebuild_route_matrix()
+
+# Fill the resident price history from the database: everything in the window at warm-up, then
+# after each ingest (here or, for followers, on the leader's) just the rows it added or touched
+async def load_price_history(incremental=False):
+    since = price_history.high_water() if incremental else None
+    if since is None:
+        rows = await repo.fetchall(HISTORY_SQL, (f"-{WINDOW_DAYS} days",), name="price_history")
+        price_history.rebuild(rows)
+    else:
+        rows = await repo.fetchall(HISTORY_SINCE_SQL, (since,), name="price_history_since")
+        price_history.load(rows)
 
-            # Update the previous price for next comparison
-            previous_prices[name] = current_price
+#Terminal-level prices: swept into the local terminal_prices table on their own schedule
+terminal_job = TerminalPriceJob(uex, concurrency=4)
 
-        if alerts:
-            alert_message = "**Commodity Price Alerts:**\n"
-            for alert in alerts:
-                name, old_price, new_price, change = alert
-                direction = "increased" if change > 0 else "decreased"
-                percentage_change = abs(change) * 100
-                alert_message += (f"**{name}** has {direction} by {percentage_change:.2f}%!\n"
-                                  f"Previous Price: {old_price} UEC\n"
-                                  f"New Price: {new_price} UEC\n\n")
+async def rebuild_route_matrix():
+    rows = await repo.all_terminal_prices()
+    if not rows:
+        return
+    matrix = await asyncio.to_thread(route_engine.rebuild, rows)
+    terminal_index.rebuild(route_engine.terminal_names())
+    print(f"✅ Route matrix rebuilt: {len(matrix.terminals)} terminals x {len(matrix.commodities)} commodities.")
+
+@tasks.loop(minutes=15)
+@metrics.timed_task("fetch_terminal_prices")
+async def fetch_terminal_prices():
+    if ingest.last_snapshot is not None:
+        names = [c["name"] for c in ingest.last_snapshot.priced()]
+    else:
+        names = await repo.commodity_names()
 
-            alert_channel = bot.get_channel(ALERT_CHANNEL_ID)
-            if alert_channel:
-                await alert_channel.send(alert_message)
+    rows = await terminal_job.run(names)
+    if rows is None:
+        return
+    now = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    stored = await repo.store_terminal_prices(rows, now)
+    print(f"✅ Stored {stored} terminal prices for {len(names)} commodities.")
+    await rebuild_route_matrix()
+    await cluster.notify("terminals")
+
+# Local data older than this (or any local data while the UEX circuit is open) is flagged as stale
+STALE_AFTER = datetime.timedelta(minutes=45)
+# Longest a command waits on the live API before falling back to what we have
+UPSTREAM_TIMEOUT = 5
+
+def parse_utc(timestamp):
+    """Stored 'YYYY-MM-DD HH:MM:SS' UTC timestamps as aware datetimes (None if unparseable)"""
+    try:
+        parsed = datetime.datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+def staleness_note(as_of):
+    """Footer text for data stored at `as_of`, or None when it is fresh and the API is up"""
+    if as_of is None:
+        return None
+    age = datetime.datetime.now(datetime.timezone.utc) - as_of
+    if uex.available and age <= STALE_AFTER:
+        return None
+    reason = "UEX API unavailable" if not uex.available else "not refreshed recently"
+    return f"⚠️ Stored snapshot from {as_of:%Y-%m-%d %H:%M} UTC ({reason})"
+
+# Terminal prices for one commodity: the local sweep when we have it, otherwise the live API (cached),
+# falling back to the last cached answer when the API is down or slow.
+# The result carries "as_of" (a UTC datetime) so commands can flag stale data.
+async def get_terminal_prices(name):
+    rows = await repo.terminal_prices(name)
+    if rows:
+        stamps = [row["updated_at"] for row in rows if row.get("updated_at")]
+        return {"status": "ok", "data": rows, "as_of": parse_utc(max(stamps)) if stamps else None}
 
-    except Exception as e:
-        print(f"❌ Error: {str(e)}")
+    try:
+        if not uex.available:
+            raise CircuitOpenError("UEX API circuit is open")
+        data = await asyncio.wait_for(terminal_price_cache.get(name), UPSTREAM_TIMEOUT)
+        return dict(data, as_of=None)
+    except (UEXError, asyncio.TimeoutError):
+        cached = terminal_price_cache.peek(name)
+        if cached is None:
+            raise UEXError(f"UEX API unavailable and no stored prices for {name}")
+        data, age = cached
+        as_of = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=age)
+        return dict(data, as_of=as_of.replace(microsecond=0))
 
 #Task Loop Commodity Prices
 @tasks.loop(minutes=5)
+@metrics.timed_task("fetch_commodity_prices")
 async def fetch_commodity_prices():
     print("✅ fetch_commodity_prices() function is running...")  # Debug log
-    conn = sqlite3.connect('organizations.db')
-    cursor = conn.cursor()
-
-    # Fetch commodity data from API
-    async with aiohttp.ClientSession() as session:
-        url = "https://api.uexcorp.space/2.0/commodities"
-        async with session.get(url) as response:
-            if response.status == 200:
-                response_data = await response.json()
-
-                if response_data.get("status") == "ok":
-                    commodities = response_data.get("data", [])
-                    print(f"✅ Fetched {len(commodities)} commodities.")  # Debug log
-
-                    # Insert data into the database
-                    for commodity in commodities:
-                        commodity_name = commodity.get("name")
-                        price_buy = commodity.get("price_buy")
-                        price_sell = commodity.get("price_sell")
-                        weight_scu = commodity.get("weight_scu")
-
-                        if commodity_name and price_buy and price_sell:
-                            cursor.execute(
-                                "INSERT INTO commodity_prices (commodity_name, price_buy, price_sell, weight_scu, timestamp) VALUES (?, ?, ?, ?, datetime('now'))",
-                                (commodity_name, price_buy, price_sell, weight_scu)
-                            )
-
-                    # Commit the changes
-                    conn.commit()
-
-                    print(f"✅ Inserted {len(commodities)} commodity prices into the database.")  # Debug log
-                else:
-                    print("❌ Failed to fetch valid data. API response status not 'ok'.")
-
-    # Remove data older than 7 days
-    cursor.execute("DELETE FROM commodity_prices WHERE timestamp < datetime('now', '-7 days')")
-
-    conn.commit()
-    conn.close()
-    print("✅ Old commodity data older than 7 days removed.")  # Debug log
+    if await ingest.run_once() is not None and not startup.reported:
+        startup.mark("first ingest")
+        startup.finish()
+
+# The loops start during warm-up; hold the first ingest until the gateway is up so alerts can be posted
+@fetch_commodity_prices.before_loop
+async def before_fetch_commodity_prices():
+    await bot.wait_until_ready()
 
 # Run the task once when the bot starts up
 #async def fetch_initial_commodity_data():
@@ -376,15 +422,8 @@ async def commodity(
         # ✅ Acknowledge the command before querying the database
         await ctx.defer()
 
-        async with aiosqlite.connect('organizations.db') as conn:
-            cursor = await conn.execute('''
-                SELECT price_buy, price_sell, COALESCE(weight_scu, 0), timestamp 
-                FROM commodity_prices 
-                WHERE commodity_name = ? 
-                ORDER BY timestamp DESC 
-                LIMIT 1
-            ''', (name,))
-            result = await cursor.fetchone()
+        # Resident history first; the database covers anything older than its window
+        result = price_history.latest(name) or await repo.latest_price(name)
 
         if not result:
             await ctx.respond(f"❌ No data found for commodity: {name}")
@@ -402,7 +441,8 @@ async def commodity(
         embed.add_field(name="💰 Buy Price", value=f"{price_buy} aUEC", inline=True)
         embed.add_field(name="💵 Sell Price", value=f"{price_sell} aUEC", inline=True)
         embed.add_field(name="⚖️ Weight (SCU)", value=f"{weight_scu}", inline=False)
-        embed.set_footer(text=f"Last updated: {timestamp}")
+        note = staleness_note(parse_utc(timestamp))
+        embed.set_footer(text=f"Last updated: {timestamp}" + (f"\n{note}" if note else ""))
 
         # ✅ Use ctx.respond() instead of ctx.send()
         await ctx.respond(embed=embed)
@@ -422,15 +462,11 @@ async def best_locations(
         # ✅ Defer response to prevent timeout
         await ctx.defer()
 
-        prices_url = f"https://api.uexcorp.space/2.0/commodities_prices?commodity_name={name}"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(prices_url) as response:
-                if response.status != 200:
-                    await ctx.respond(f"❌ API error: Unable to fetch data for {name}.")
-                    return
-                
-                prices_data = await response.json()
+        try:
+            prices_data = await get_terminal_prices(name)
+        except UEXError:
+            await ctx.respond(f"❌ API error: Unable to fetch data for {name}.")
+            return
 
         # ✅ Ensure valid API response
         if prices_data.get("status") != "ok" or not prices_data.get("data"):
@@ -475,6 +511,9 @@ async def best_locations(
         )
         embed.add_field(name="📈 Best Selling Location", value=sell_info, inline=False)
         embed.add_field(name="📉 Best Buying Location", value=buy_info, inline=False)
+        note = staleness_note(prices_data.get("as_of"))
+        if note:
+            embed.set_footer(text=note)
 
         # ✅ Use ctx.respond() to ensure bot replies
         await ctx.respond(embed=embed)
@@ -500,16 +539,11 @@ async def cargo_manifest(
             await ctx.respond("❌ Amount of SCU must be greater than 0.")
             return
 
-        # ✅ Corrected variable name from commodity_name → name
-        prices_url = f"https://api.uexcorp.space/2.0/commodities_prices?commodity_name={name}"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(prices_url) as response:
-                if response.status != 200:
-                    await ctx.respond(f"❌ API error: Unable to fetch data for {name}.")
-                    return
-                
-                prices_data = await response.json()
+        try:
+            prices_data = await get_terminal_prices(name)
+        except UEXError:
+            await ctx.respond(f"❌ API error: Unable to fetch data for {name}.")
+            return
 
         # ✅ Ensure valid API response
         if prices_data.get("status") != "ok" or not prices_data.get("data"):
@@ -536,6 +570,9 @@ async def cargo_manifest(
                 ),
                 color=discord.Color.purple()
             )
+            note = staleness_note(prices_data.get("as_of"))
+            if note:
+                embed.set_footer(text=note)
             await ctx.respond(embed=embed)
         else:
             await ctx.respond(f"❌ No valid selling location found for {name}.")
@@ -543,305 +580,482 @@ async def cargo_manifest(
     except Exception as e:
         await ctx.respond(f"❌ Error: {str(e)}")
 
+# Mixed cargo: where to sell everything in the hold, under terminal demand and a stop limit
+@bot.slash_command(name="cargo_plan", description="Plan where to sell a mixed cargo hold")
+async def cargo_plan(
+    ctx,
+    cargo: Option(str, "Commodities and SCU, e.g. Gold 100, Laranite 250"),
+    max_stops: Option(int, "Maximum terminals to sell at (any number if empty)", min_value=1, max_value=10, required=False, default=None)
+):
+    """Split a mixed cargo across terminals for the highest total value"""
+    try:
+        await ctx.defer()
+
+        try:
+            items = parse_cargo(cargo)
+        except ValueError as e:
+            await ctx.respond(f"❌ {e}")
+            return
+        if not items:
+            await ctx.respond("❌ List at least one commodity and amount, e.g. `Gold 100, Laranite 250`.")
+            return
+
+        # Resolve typed names against the commodity index and merge repeats
+        amounts = {}
+        for typed, scu in items:
+            matches = commodity_index.search(typed, limit=1)
+            name = matches[0] if matches else typed
+            amounts[name] = amounts.get(name, 0) + scu
+        cargo_items = list(amounts.items())
+
+        # All commodities' terminal prices at once
+        results = await asyncio.gather(*(get_terminal_prices(name) for name, _ in cargo_items), return_exceptions=True)
+        rows, as_of = [], []
+        for (name, _), result in zip(cargo_items, results):
+            if isinstance(result, Exception):
+                print(f"❌ Error fetching terminal prices for {name}: {result}")
+                rows.append([])
+                continue
+            rows.append(result.get("data") or [])
+            if result.get("as_of"):
+                as_of.append(result["as_of"])
+
+        plan = await asyncio.to_thread(plan_sales, cargo_items, rows, max_stops)
+        if not plan.sales:
+            await ctx.respond("❌ No terminal buys any of that cargo.")
+            return
+
+        embed = discord.Embed(
+            title=f"Cargo Plan: {sum(scu for _, scu in cargo_items):,} SCU, {plan.total:,.0f} aUEC",
+            color=discord.Color.purple()
+        )
+        for t in plan.stops:
+            terminal = plan.terminals[t]
+            lines = [
+                f"{sale.scu:,} SCU {plan.commodities[sale.commodity]} @ {sale.price:,.0f} = {sale.value:,.0f}"
+                for sale in plan.sales if sale.terminal == t
+            ]
+            location = terminal["city_name"] or terminal["planet_name"] or terminal["star_system_name"] or "Unknown"
+            embed.add_field(name=f"{terminal['terminal_name']} ({location})", value="\n".join(lines)[:1024], inline=False)
+            if len(embed.fields) == 24:
+                break
+        if plan.unsold:
+            embed.add_field(name="⚠️ Unsold", value=", ".join(f"{scu:,} SCU {name}" for name, scu in plan.unsold.items())[:1024], inline=False)
+
+        notes = [note for note in (staleness_note(min(as_of)) if as_of else None,
+                                   None if plan.exact else "Stops chosen heuristically") if note]
+        if notes:
+            embed.set_footer(text=" • ".join(notes))
+        await ctx.respond(embed=embed)
+
+    except Exception as e:
+        await ctx.respond(f"❌ Error: {str(e)}")
+
+# Multi-stop trade route planner
+@bot.slash_command(name="trade_route", description="Plan the most profitable multi-stop trade routes for your ship")
+async def trade_route(
+    ctx,
+    cargo_scu: Option(int, "Cargo capacity in SCU", min_value=1),
+    capital: Option(int, "Starting capital in aUEC", min_value=1),
+    max_stops: Option(int, "Maximum terminals to visit, including the first", min_value=2, max_value=6, default=3),
+    start: Option(str, "Terminal to start from (any if empty)", autocomplete=terminal_autocomplete, required=False, default=None)
+):
+    """Find the top multi-stop trade routes under cargo, capital and stop limits"""
+    try:
+        await ctx.defer()
+
+        if route_engine.matrix is None:
+            await ctx.respond("❌ Terminal prices are still loading, please try again shortly.")
+            return
+
+        matrix, routes = await asyncio.to_thread(route_engine.plan, cargo_scu, capital, max_stops, start)
+        if not routes:
+            await ctx.respond("❌ No profitable route found for that cargo and capital.")
+            return
+
+        terminals = matrix.terminals
+        commodities = matrix.commodities
+
+        def describe(t):
+            terminal = terminals[t]
+            return f"{terminal['terminal_name']} ({terminal['planet_name'] or terminal['star_system_name'] or 'Unknown'})"
+
+        embed = discord.Embed(
+            title=f"Trade Routes for {cargo_scu} SCU / {capital:,} aUEC",
+            color=discord.Color.gold()
+        )
+        for rank, route in enumerate(routes, start=1):
+            lines = [
+                f"**{i}.** {leg.scu} SCU {commodities[leg.commodity]}: {describe(leg.origin)} @ {leg.price_buy:,.0f} → "
+                f"{describe(leg.destination)} @ {leg.price_sell:,.0f} (+{leg.profit:,.0f})"
+                for i, leg in enumerate(route.legs, start=1)
+            ]
+            embed.add_field(name=f"Route {rank}: +{route.profit:,.0f} aUEC", value="\n".join(lines)[:1024], inline=False)
+
+        await ctx.respond(embed=embed)
+
+    except ValueError as e:
+        await ctx.respond(f"❌ {e}")
+    except Exception as e:
+        await ctx.respond(f"❌ Error: {str(e)}")
+
 # Market Trends !market_trends
 @bot.slash_command(name="market_trend", description="Show market trends (buy and sell) for a commodity over the last 7 days.")
 async def market_trends(ctx: discord.ApplicationContext, 
                             commodity_name: Option(str, "Choose a commodity", autocomplete=commodity_autocomplete)):
-    conn = sqlite3.connect('organizations.db')
-    cursor = conn.cursor()
-
-    # Fetch only the last 7 days of data
-    cursor.execute("""
-        SELECT timestamp, price_buy, price_sell 
-        FROM commodity_prices 
-        WHERE commodity_name = ? AND timestamp >= datetime('now', '-7 days')
-        ORDER BY timestamp ASC
-    """, (commodity_name,))
-    
-    data = cursor.fetchall()
-    conn.close()
+    await ctx.defer()
 
-    if not data:
-        await ctx.respond(f"❌ No data found for `{commodity_name}` in the last 7 days.")
-        return
+    # Charts only change when new data is ingested, so cache them per ingest version
+    key = (commodity_name, ingest.version, "market_trend")
+    png = chart_renderer.get(key)
 
-    # Convert to Pandas DataFrame for grouping by day
-    df = pd.DataFrame(data, columns=["timestamp", "price_buy", "price_sell"])
+    if png is None:
+        # Daily means for the last 7 days, from the resident history or else the daily rollups
+        data = price_history.daily_trend(commodity_name, days=7) or await repo.daily_trend(commodity_name, days=7)
 
-    # Convert timestamps to date only (YYYY-MM-DD)
-    df["timestamp"] = pd.to_datetime(df["timestamp"]).dt.date
+        if not data:
+            await ctx.respond(f"❌ No data found for `{commodity_name}` in the last 7 days.")
+            return
 
-    # Group by date and get the average buy/sell prices for each day
-    df = df.groupby("timestamp", as_index=False).mean()
+        # Extract data for plotting (dates are already YYYY-MM-DD strings for x-axis labels)
+        timestamps, price_buy, price_sell = zip(*data)
 
-    # Extract data for plotting
-    timestamps = df["timestamp"].astype(str)  # Convert dates to strings for x-axis labels
-    price_buy = df["price_buy"]
-    price_sell = df["price_sell"]
+        # Render in a worker process so the event loop keeps serving other commands
+        png = await chart_renderer.render(key, render_trend_chart, commodity_name, timestamps, price_buy, price_sell)
 
-    # Create the plot
-    fig, ax = plt.subplots(figsize=(8, 6))
-    ax.plot(timestamps, price_buy, label="Buy Price", color="green", marker="o", linestyle="--")
-    ax.plot(timestamps, price_sell, label="Sell Price", color="red", marker="x", linestyle=":")
+    # Send the plot as an image to Discord
+    await ctx.respond(file=discord.File(io.BytesIO(png), filename="market_trend.png"))
+
+# Price history export: streamed to gzip CSV (or Parquet) parts that fit Discord's upload limit
+EXPORT_MAX_PARTS = 10  # one message's worth of attachments; use `python export.py` for more
+
+@bot.slash_command(name="export_prices", description="Download price history as gzip CSV or Parquet")
+async def export_prices(
+    ctx: discord.ApplicationContext,
+    source: Option(str, "Raw rows (last 7 days) or hourly/daily averages", choices=list(export.SOURCES), default="raw"),
+    commodity: Option(str, "Only this commodity (all if empty)", autocomplete=commodity_autocomplete, required=False, default=None),
+    since: Option(str, "First day, YYYY-MM-DD", required=False, default=None),
+    until: Option(str, "Last day, YYYY-MM-DD", required=False, default=None),
+    file_format: Option(str, "File format", choices=list(export.FORMATS), default="csv")
+):
+    await ctx.defer()
+    # Leave headroom under the guild's upload limit for the multipart envelope
+    part_size = int((ctx.guild.filesize_limit if ctx.guild else 8 * 1024 * 1024) * 0.95)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The commodity is free text, so keep only filename-safe characters (as profiling's dump does)
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in commodity or "")[:64]
+        name = f"prices_{source}{'_' + safe if safe else ''}{export.EXTENSIONS[file_format]}"
+        try:
+            paths, rows, complete = await asyncio.to_thread(
+                export.export_prices, os.path.join(workdir, name), source, file_format, commodity, since, until,
+                part_size=part_size, max_parts=EXPORT_MAX_PARTS, db_path=repo.path
+            )
+        except ValueError as e:
+            await ctx.respond(f"❌ {e}")
+            return
+        except OSError as e:
+            print(f"❌ Price export failed: {e}")
+            await ctx.respond("❌ Couldn't write the export file. Please try again later.")
+            return
 
-    # Formatting the x-axis
-    plt.xticks(rotation=45, ha='right')
-    plt.xlabel("Date")
-    plt.ylabel("Price (UEC)")
-    plt.title(f"Market Trend for {commodity_name} (Last 7 Days)")
-    plt.legend()
-    plt.grid()
+        if not rows:
+            await ctx.respond("❌ No price history matches that filter.")
+            return
 
-    # Save the plot to a BytesIO object
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    buf.seek(0)  # Move to start of file for Discord to read
+        message = f"📦 {rows:,} rows in {len(paths)} file{'s' if len(paths) != 1 else ''}."
+        if not complete:
+            message += " ⚠️ Export truncated; narrow the date range or use `python export.py` for the rest."
+        await ctx.respond(message, files=[discord.File(path) for path in paths])
+
+# Alert subscriptions (per channel, optionally per commodity and with a minimum move)
+@bot.slash_command(name="alert_subscribe", description="Post price alerts in a channel")
+@discord.default_permissions(manage_channels=True)
+async def alert_subscribe(
+    ctx: discord.ApplicationContext,
+    commodity: Option(str, "Only alert for this commodity (all if empty)", autocomplete=commodity_autocomplete, required=False, default=None),
+    min_change_pct: Option(float, "Only alert on moves of at least this percent", min_value=0, required=False, default=None),
+    channel: Option(discord.TextChannel, "Channel to post alerts in (this one if empty)", required=False, default=None)
+):
+    """Subscribe a channel to price alerts"""
+    if ctx.guild is None:
+        await ctx.respond("❌ Alert subscriptions are only available in servers.", ephemeral=True)
+        return
+    channel = channel or ctx.channel
+    min_change = min_change_pct / 100 if min_change_pct is not None else None
+
+    await repo.write(subscribe, ctx.guild.id, channel.id, commodity or "*", min_change)
+    threshold = f" on moves of {min_change_pct:g}% or more" if min_change is not None else ""
+    await ctx.respond(f"✅ {channel.mention} will receive alerts for {commodity or 'all commodities'}{threshold}.")
+
+@bot.slash_command(name="alert_unsubscribe", description="Stop posting price alerts in a channel")
+@discord.default_permissions(manage_channels=True)
+async def alert_unsubscribe(
+    ctx: discord.ApplicationContext,
+    commodity: Option(str, "Commodity to stop alerting for (everything if empty)", autocomplete=commodity_autocomplete, required=False, default=None),
+    channel: Option(discord.TextChannel, "Channel to unsubscribe (this one if empty)", required=False, default=None)
+):
+    """Remove one or all of a channel's alert subscriptions"""
+    channel = channel or ctx.channel
+    removed = await repo.write(unsubscribe, channel.id, commodity)
+    if removed:
+        await ctx.respond(f"✅ Removed {removed} alert subscription(s) from {channel.mention}.")
+    else:
+        await ctx.respond(f"❌ {channel.mention} has no matching alert subscriptions.")
 
-    # Send the plot as an image to Discord
-    await ctx.respond(file=discord.File(buf, filename="market_trend.png"))
+@bot.slash_command(name="alert_subscriptions", description="List this server's price alert subscriptions")
+async def alert_subscriptions(ctx: discord.ApplicationContext):
+    if ctx.guild is None:
+        await ctx.respond("❌ Alert subscriptions are only available in servers.", ephemeral=True)
+        return
+    rows = await repo.fetchall(GUILD_SUBSCRIPTIONS_SQL, (ctx.guild.id,))
+    if not rows:
+        await ctx.respond("No alert subscriptions yet. Use `/alert_subscribe` to add one.")
+        return
 
-    # Clean up resources
-    buf.close()
-    plt.close(fig)
+    lines = [
+        f"<#{channel_id}>: {'all commodities' if name == '*' else name}"
+        + (f" (≥ {min_change * 100:g}%)" if min_change is not None else "")
+        for channel_id, name, min_change in rows
+    ]
+    embed = discord.Embed(title="🔔 Price Alert Subscriptions", description="\n".join(lines)[:4096], color=discord.Color.orange())
+    await ctx.respond(embed=embed)
+
+# Admin view of the metrics registry
+@bot.slash_command(name="bot_stats", description="Show command, API, database and cache performance (admin)")
+@discord.default_permissions(administrator=True)
+async def bot_stats(ctx: discord.ApplicationContext):
+    def ms(seconds):
+        if seconds is None or seconds == float("inf"):
+            return "—"
+        return f"{seconds * 1000:,.0f} ms" if seconds >= 0.01 else f"{seconds * 1000:.1f} ms"
+
+    def table(histogram, label, limit=10):
+        lines = [
+            f"`{label(labels)}` {count}× avg {ms(mean)}, p95 ≤ {ms(p95)}"
+            for labels, count, mean, p95 in histogram.summary()[:limit]
+        ]
+        return "\n".join(lines)[:1024] or "No samples yet."
+
+    embed = discord.Embed(title="📈 A.P.T Stats", color=discord.Color.dark_teal())
+    embed.add_field(name="Commands", value=table(metrics.command_seconds, lambda l: f"/{l['command']} {l['status']}"), inline=False)
+    embed.add_field(name="UEX API", value=table(metrics.uex_request_seconds, lambda l: f"{l['endpoint']} {l['status']}"), inline=False)
+    embed.add_field(name="Database", value=table(metrics.db_query_seconds, lambda l: f"{l['kind']} {l['query']}"), inline=False)
+    embed.add_field(name="Task loops", value=table(metrics.task_seconds, lambda l: f"{l['task']} {l['status']}"), inline=False)
+
+    cache = terminal_price_cache.stats()
+    chart_lookups = chart_renderer.hits + chart_renderer.misses
+    embed.add_field(name="Caches", value=(
+        f"Terminal prices: {cache['hit_rate']:.0%} of {cache['hits'] + cache['stale_hits'] + cache['misses']} lookups\n"
+        f"Charts: {chart_renderer.hits / chart_lookups if chart_lookups else 0:.0%} of {chart_lookups} lookups"
+    ), inline=False)
+    embed.set_footer(text=f"Ingest cycles: {ingest.version} · Alerts sent: {alert_dispatcher.sent}")
+    await ctx.respond(embed=embed, ephemeral=True)
+
+# On-demand sampling profile, written as collapsed stacks for flamegraph.pl / speedscope
+@bot.slash_command(name="profile", description="Record a sampling profile of the bot or of one command (admin)")
+@discord.default_permissions(administrator=True)
+async def profile(
+    ctx: discord.ApplicationContext,
+    seconds: Option(int, "How long to record", min_value=1, max_value=120, default=15),
+    command: Option(str, "Only sample while this command runs (whole process if empty)", required=False, default=None)
+):
+    if command_profiler.busy:
+        await ctx.respond("❌ A profile is already being recorded.", ephemeral=True)
+        return
+    command = command.lstrip("/") if command else None
+    if command and bot.get_application_command(command) is None:
+        await ctx.respond(f"❌ Unknown command `/{command}`.", ephemeral=True)
+        return
+
+    target = f"`/{command}` invocations" if command else "the whole process"
+    await ctx.respond(f"⏺️ Sampling {target} for {seconds}s...", ephemeral=True)
+    profiler, path = await command_profiler.run(seconds, command)
+
+    summary = f"✅ {profiler.sample_count} samples, {len(profiler.samples)} unique stacks"
+    if command:
+        summary += f" over {command_profiler.invocations} invocation(s)"
+    if not profiler.samples:
+        await ctx.followup.send(summary + ".", ephemeral=True)
+        return
+    await ctx.followup.send(f"{summary}. Saved to `{path}`.", file=discord.File(path), ephemeral=True)
+
+# Organisations
+async def org_autocomplete(ctx: discord.AutocompleteContext):
+    return [row[0] for row in await repo.fetchall(org_queries.ORG_NAMES_SQL, (ctx.value or "",), name="org_names")]
+
+# Discord user mentions (<@123>, <@!123>) or raw user ids
+MEMBER_REF_RE = re.compile(r"<@!?(\d+)>|\b(\d{15,20})\b")
 
-''' Comment out Organisation section for future use
 # Command to create an organization
 @bot.slash_command(name="create_org", description="Enter Organisation Name")
-async def create_org(ctx, org_name: str, *, description: str):
-    leader_id = ctx.author.id
-    create_organization(org_name, description, leader_id)
-    await ctx.send(f"✅ Organization `{org_name}` created successfully!")
+async def create_org(ctx: discord.ApplicationContext, org_name: str, description: str):
+    result = await repo.write(create_organization, org_name, description, ctx.author.id)
+    await ctx.respond(result)
 
 # Command to join an organization
 @bot.slash_command(name="join_org", description="Enter Organisation Name")
-async def join_org(ctx, org_name: str):
-    result = join_organization(ctx.author.id, org_name)
-    await ctx.send(result)
+async def join_org(ctx: discord.ApplicationContext, org_name: Option(str, "Organisation", autocomplete=org_autocomplete)):
+    result = await repo.write(join_organization, ctx.author.id, org_name)
+    leaderboards.discard(org_name)
+    await ctx.respond(result)
+
+# Command to award points to one or many members in one transaction
+@bot.slash_command(name="award_points", description="Award points to one or more members of your organisation")
+async def award_points_command(
+    ctx: discord.ApplicationContext,
+    org_name: Option(str, "Organisation", autocomplete=org_autocomplete),
+    members: Option(str, "Members to award (mentions or user ids, any number)"),
+    points: int
+):
+    member_ids = [int(mention or raw) for mention, raw in MEMBER_REF_RE.findall(members)]
+    if not member_ids:
+        await ctx.respond("❌ Mention at least one member.")
+        return
 
-# Command to award points to a member
-@bot.slash_command(name="award_points", description="Discord name, Organisation name and point value")
-async def award_points_command(ctx, member: discord.Member, org_name: str, points: int):
-    result = award_points(ctx.author.id, member.id, org_name, points)
-    await ctx.send(result)
+    result, updated, missing = await repo.write(award_points, ctx.author.id, org_name, [(m, points) for m in member_ids])
+    leaderboards.set_points(org_name, updated)
+    if missing:
+        result += f"\n⚠️ Not in `{org_name}`: " + ", ".join(f"<@{m}>" for m in missing[:20])
+        if len(missing) > 20:
+            result += f" and {len(missing) - 20} more"
+    await ctx.respond(result[:2000])
 
 # Command to leave an organization
 @bot.slash_command(name="leave_org", description="Enter Org Name")
-async def leave_org(ctx, org_name: str):
-    result = leave_organization(ctx.author.id, org_name)
-    await ctx.send(result)
+async def leave_org(ctx: discord.ApplicationContext, org_name: Option(str, "Organisation", autocomplete=org_autocomplete)):
+    result = await repo.write(leave_organization, ctx.author.id, org_name)
+    leaderboards.discard(org_name)
+    await ctx.respond(result)
 
 # Org Info
 @bot.slash_command(name="org_info", description="Displays information about an organization")
-async def org_info(ctx: discord.ApplicationContext, org_name: str):
-    conn = sqlite3.connect('organizations.db')
-    cursor = conn.cursor()
-
-    # Check if the organization exists
-    cursor.execute("SELECT description FROM organizations WHERE org_name = ?", (org_name,))
-    org_data = cursor.fetchone()
-    if not org_data:
-        conn.close()
+async def org_info(ctx: discord.ApplicationContext, org_name: Option(str, "Organisation", autocomplete=org_autocomplete)):
+    row = await repo.fetchone(org_queries.ORG_INFO_SQL, (org_name,), name="org_info")
+    ranking = await leaderboards.get(org_name) if row else None
+    if not row or ranking is None:
         await ctx.respond(f"❌ Organization `{org_name}` does not exist.")
         return
 
-    description = org_data[0]
+    description, leader_id = row
+    top = ranking.page(0, 1)
 
-    # Get the total number of members
-    cursor.execute("SELECT COUNT(*) FROM members WHERE org_name = ?", (org_name,))
-    total_members = cursor.fetchone()[0]
-
-    # Get the leader (first member added, assuming they are the leader)
-    cursor.execute("SELECT user_id FROM members WHERE org_name = ? ORDER BY rowid ASC LIMIT 1", (org_name,))
-    leader_data = cursor.fetchone()
-    leader_id = leader_data[0] if leader_data else "Unknown"
+    # Create Embed
+    embed = discord.Embed(title=f"📜 Organization Info: {org_name}", color=discord.Color.blue())
+    embed.add_field(name="📖 Description", value=description or "None", inline=False)
+    embed.add_field(name="👥 Members", value=str(len(ranking)), inline=True)
+    embed.add_field(name="👑 Leader", value=f"<@{leader_id}>", inline=True)
+    top_member = f"<@{top[0][1]}> ({top[0][2]} points)" if top else "None"
+    embed.add_field(name="🏆 Top Member", value=top_member, inline=True)
 
-    # Get the member with the most points
-    cursor.execute("SELECT user_id, MAX(points) FROM members WHERE org_name = ?", (org_name,))
-    top_member_data = cursor.fetchone()
-    top_member_id = top_member_data[0] if top_member_data and top_member_data[0] else "None"
-    top_points = top_member_data[1] if top_member_data and top_member_data[1] is not None else 0
+    await ctx.respond(embed=embed)
 
-    conn.close()
+LEADERBOARD_PAGE = 10
 
-    # Convert IDs to Discord mentions
-    leader_mention = f"<@{leader_id}>" if leader_id != "Unknown" else "Unknown"
-    top_member_mention = f"<@{top_member_id}>" if top_member_id != "None" else "None"
+# Points leaderboard, one page at a time
+@bot.slash_command(name="leaderboard", description="Show an organization's points leaderboard")
+async def leaderboard(ctx: discord.ApplicationContext, org_name: Option(str, "Organisation", autocomplete=org_autocomplete),
+                      page: Option(int, "Page", required=False, default=1, min_value=1)):
+    ranking = await leaderboards.get(org_name)
+    if ranking is None:
+        await ctx.respond(f"❌ Organization `{org_name}` does not exist.")
+        return
 
-    # Create Embed
-    embed = discord.Embed(title=f"📜 Organization Info: {org_name}", color=discord.Color.blue())
-    embed.add_field(name="📖 Description", value=description, inline=False)
-    embed.add_field(name="👥 Members", value=str(total_members), inline=True)
-    embed.add_field(name="👑 Leader", value=leader_mention, inline=True)
-    embed.add_field(name="🏆 Top Member", value=f"{top_member_mention} ({top_points} points)", inline=True)
+    pages = max((len(ranking) + LEADERBOARD_PAGE - 1) // LEADERBOARD_PAGE, 1)
+    page = min(page, pages)
+    entries = ranking.page((page - 1) * LEADERBOARD_PAGE, LEADERBOARD_PAGE)
+    lines = "\n".join(f"**#{rank}** <@{user_id}> - {points} points" for rank, user_id, points in entries)
 
+    embed = discord.Embed(title=f"🏆 Leaderboard: {org_name}", description=lines or "No members.", color=discord.Color.gold())
+    embed.set_footer(text=f"Page {page}/{pages} • {len(ranking)} members")
     await ctx.respond(embed=embed)
 
-    # Command to create a new role
-@bot.slash_command(name="create_role", description="Create a custom role in your organization (Leader Only)")
-async def create_role(ctx: discord.ApplicationContext, org_name: str, role_name: str):
-    conn = sqlite3.connect("organizations.db")
-    cursor = conn.cursor()
-    
-    # Check if the user is the leader by checking the 'leader_id' from the organizations table
-    cursor.execute("SELECT leader_id FROM organizations WHERE org_name = ?", (org_name,))
-    leader_data = cursor.fetchone()
-    
-    if not leader_data or leader_data[0] != ctx.author.id:
-        await ctx.respond("❌ Only the organization leader can create roles.")
-        conn.close()
+# A member's rank (your own by default)
+@bot.slash_command(name="org_rank", description="Show your (or a member's) rank in an organization")
+async def org_rank(ctx: discord.ApplicationContext, org_name: Option(str, "Organisation", autocomplete=org_autocomplete),
+                   member: Option(discord.Member, "Member", required=False, default=None)):
+    ranking = await leaderboards.get(org_name)
+    if ranking is None:
+        await ctx.respond(f"❌ Organization `{org_name}` does not exist.")
         return
-    
-    # Insert the new role
-    try:
-        cursor.execute("INSERT INTO roles (org_name, role_name) VALUES (?, ?)", (org_name, role_name))
-        conn.commit()
-        await ctx.respond(f"✅ Role `{role_name}` created successfully in `{org_name}`!")
-    except sqlite3.IntegrityError:
-        await ctx.respond("❌ This role already exists in the organization.")
-    
-    conn.close()
 
-# Command to assign a custom role
-@bot.slash_command(name="assign_role", description="Assign a custom role to a member in your organization")
-async def assign_role(ctx: discord.ApplicationContext, member: discord.Member, org_name: str, role_name: str):
-    conn = sqlite3.connect("organizations.db")
-    cursor = conn.cursor()
-    
-    # Check if the role exists in the organization
-    cursor.execute("SELECT role_name FROM roles WHERE org_name = ? AND role_name = ?", (org_name, role_name))
-    role_exists = cursor.fetchone()
-    if not role_exists:
-        await ctx.respond("❌ This role does not exist in the organization.")
-        conn.close()
+    user_id = member.id if member else ctx.author.id
+    position = ranking.rank(user_id)
+    if position is None:
+        await ctx.respond(f"❌ <@{user_id}> is not a member of `{org_name}`.")
         return
-    
-    # Assign the role to the member
-    cursor.execute("UPDATE members SET role = ? WHERE user_id = ? AND org_name = ?", (role_name, str(member.id), org_name))
-    conn.commit()
-    conn.close()
-    
-    await ctx.respond(f"✅ Assigned role `{role_name}` to {member.mention} in `{org_name}`.")
+
+    rank, points = position
+    await ctx.respond(f"🏅 <@{user_id}> is **#{rank}** of {len(ranking)} in `{org_name}` with {points} points.")
+
+# Command to create a new role
+@bot.slash_command(name="create_role", description="Create a custom role in your organization (Leader Only)")
+async def create_role_command(ctx: discord.ApplicationContext, org_name: Option(str, "Organisation", autocomplete=org_autocomplete), role_name: str):
+    result = await repo.write(create_role, ctx.author.id, org_name, role_name)
+    await ctx.respond(result)
+
+# Command to assign a custom role
+@bot.slash_command(name="assign_role", description="Assign a custom role to a member in your organization (Leader Only)")
+async def assign_role_command(ctx: discord.ApplicationContext, member: discord.Member, org_name: Option(str, "Organisation", autocomplete=org_autocomplete), role_name: str):
+    result = await repo.write(assign_role, ctx.author.id, member.id, org_name, role_name)
+    await ctx.respond(result)
 
 # Command to view roles in an organization
 @bot.slash_command(name="org_roles", description="List all roles in an organization")
-async def org_roles(ctx: discord.ApplicationContext, org_name: str):
-    conn = sqlite3.connect("organizations.db")
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT role_name FROM roles WHERE org_name = ?", (org_name,))
-    roles = cursor.fetchall()
-    conn.close()
-    
+async def org_roles(ctx: discord.ApplicationContext, org_name: Option(str, "Organisation", autocomplete=org_autocomplete)):
+    roles = await repo.fetchall(org_queries.ORG_ROLES_SQL, (org_name,), name="org_roles")
     if not roles:
         await ctx.respond("❌ No roles found in this organization.")
         return
-    
-    role_list = "\n".join([role[0] for role in roles])
-    await ctx.respond(f"📜 **Roles in {org_name}:**\n{role_list}")
+
+    role_list = "\n".join(f"{role} ({members} members)" for role, _, members in roles)
+    await ctx.respond(f"📜 **Roles in {org_name}:**\n{role_list}"[:2000])
 
 # Set Income Share per role
 @bot.slash_command(name="set_income_share", description="Set the income share percentage for a role (Leader Only)")
-async def set_income_share(ctx: discord.ApplicationContext, org_name: str, role_name: str, income_share: float):
+async def set_income_share_command(ctx: discord.ApplicationContext, org_name: Option(str, "Organisation", autocomplete=org_autocomplete), role_name: str, income_share: float):
     if income_share < 0 or income_share > 100:
         await ctx.respond("❌ Income share must be between 0 and 100%.")
         return
 
-    conn = sqlite3.connect("organizations.db")
-    cursor = conn.cursor()
-
-    # Verify if the user is the organization leader
-    cursor.execute("SELECT leader_id FROM organizations WHERE org_name = ?", (org_name,))
-    leader_data = cursor.fetchone()
-
-    if not leader_data or leader_data[0] != ctx.author.id:
-        await ctx.respond("❌ Only the organization leader can set income share percentages.")
-        conn.close()
-        return
-
-    # Check if the role exists in the organization
-    cursor.execute("SELECT role_name FROM roles WHERE org_name = ? AND role_name = ?", (org_name, role_name))
-    role_exists = cursor.fetchone()
-
-    if not role_exists:
-        await ctx.respond("❌ This role does not exist in the organization.")
-        conn.close()
-        return
-
-    # Update the income share for the role
-    cursor.execute("UPDATE roles SET income_share = ? WHERE org_name = ? AND role_name = ?", (income_share, org_name, role_name))
-    conn.commit()
-    conn.close()
-
-    await ctx.respond(f"✅ Set income share for `{role_name}` in `{org_name}` to {income_share}%.")
+    result = await repo.write(set_income_share, ctx.author.id, org_name, role_name, income_share)
+    await ctx.respond(result)
 
 # Income Share Display
 @bot.slash_command(name="income_shares", description="View the income share percentages for all roles in an organization")
-async def income_shares(ctx: discord.ApplicationContext, org_name: str):
-    conn = sqlite3.connect("organizations.db")
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT role_name, income_share FROM roles WHERE org_name = ?", (org_name,))
-    roles = cursor.fetchall()
-    conn.close()
-
+async def income_shares(ctx: discord.ApplicationContext, org_name: Option(str, "Organisation", autocomplete=org_autocomplete)):
+    roles = await repo.fetchall(org_queries.ORG_ROLES_SQL, (org_name,), name="org_roles")
     if not roles:
         await ctx.respond("❌ No roles found in this organization.")
         return
 
-    role_list = "\n".join([f"**{role[0]}** - {role[1]}%" for role in roles])
-    await ctx.respond(f"📜 **Income Shares in {org_name}:**\n{role_list}")
+    role_list = "\n".join(f"**{role}** - {share}%" for role, share, _ in roles)
+    await ctx.respond(f"📜 **Income Shares in {org_name}:**\n{role_list}"[:2000])
 
-# Distribute Income per role
+# Distribute Income per role (computed per role in SQL, so large orgs don't load every member)
 @bot.slash_command(name="distribute_income", description="Distribute total income among members based on role shares (Leader Only)")
-async def distribute_income(ctx: discord.ApplicationContext, org_name: str, total_income: float):
+async def distribute_income(ctx: discord.ApplicationContext, org_name: Option(str, "Organisation", autocomplete=org_autocomplete), total_income: float):
     if total_income <= 0:
         await ctx.respond("❌ Total income must be greater than 0.")
         return
 
-    conn = sqlite3.connect("organizations.db")
-    cursor = conn.cursor()
-
     # Verify if the user is the organization leader
-    cursor.execute("SELECT leader_id FROM organizations WHERE org_name = ?", (org_name,))
-    leader_data = cursor.fetchone()
-
-    if not leader_data or leader_data[0] != ctx.author.id:
+    org = await repo.fetchone(org_queries.ORG_LEADER_SQL, (org_name,), name="org_leader")
+    if not org or org[1] != ctx.author.id:
         await ctx.respond("❌ Only the organization leader can distribute income.")
-        conn.close()
-        return
-
-    # Get all members and their assigned roles
-    cursor.execute("SELECT user_id, role FROM members WHERE org_name = ?", (org_name,))
-    members = cursor.fetchall()
-
-    if not members:
-        await ctx.respond("❌ No members found in this organization.")
-        conn.close()
         return
 
-    # Get role income shares
-    cursor.execute("SELECT role_name, income_share FROM roles WHERE org_name = ?", (org_name,))
-    role_shares = {role: share for role, share in cursor.fetchall()}
-
-    conn.close()
-
-    # Calculate total share percentage assigned
-    total_assigned_share = sum(role_shares.get(member[1], 0) for member in members)
-
-    if total_assigned_share == 0:
+    payouts = await repo.fetchall(org_queries.INCOME_DISTRIBUTION_SQL, (org[0], total_income, total_income), name="income_distribution")
+    if not payouts:
         await ctx.respond("❌ No valid income shares found for roles.")
         return
 
-    # Calculate individual payouts
-    payouts = {}
-    for user_id, role in members:
-        role_share = role_shares.get(role, 0)
-        if role_share > 0:
-            payouts[user_id] = (role_share / total_assigned_share) * total_income
+    payout_message = "\n".join(
+        f"**{role}** ({members} member{'s' if members != 1 else ''}): **${each:,.2f}** each, ${role_total:,.2f} total"
+        for role, members, each, role_total in payouts
+    )
+    await ctx.respond(f"📢 **Income Distribution for `{org_name}`:**\n{payout_message}"[:2000])
 
-    # Generate output message
-    payout_message = "\n".join([f"<@{user_id}> receives **${amount:.2f}**" for user_id, amount in payouts.items()])
 
-    await ctx.respond(f"📢 **Income Distribution for `{org_name}`:**\n{payout_message}")
-Comment out Organisation section for future use''' 
-bot.run(TOKEN)
\ No newline at end of file
+if __name__ == "__main__":
+    bot.run(TOKEN)
\ No newline at end of file
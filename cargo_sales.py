@@ -0,0 +1,168 @@
+import itertools
+import math
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from trade_routes import TERMINAL_FIELDS
+
+# Evaluate every set of stops when there are at most this many; otherwise greedy + swaps
+EXHAUSTIVE_LIMIT = 20000
+SWAP_ROUNDS = 3
+
+# "Gold 100, Laranite: 250; Agricium=40". The amount takes any sign or decimals with it, so
+# "Gold -5" or "Gold 1.5" is rejected instead of reading as "Gold -" / "Gold 1." and 5
+_ITEM_RE = re.compile(r"^\s*(.+?)\s*[:=]?\s*([-+]?[\d.]+)\s*(?:scu)?\s*$", re.IGNORECASE)
+
+
+def parse_cargo(text):
+    """[(commodity, scu)] from a comma/semicolon separated list; raises ValueError on a bad item"""
+    items = []
+    for part in re.split(r"[,;\n]", text or ""):
+        if not part.strip():
+            continue
+        match = _ITEM_RE.match(part)
+        if not match or match.group(1)[-1] in "-+":
+            raise ValueError(f"Couldn't read `{part.strip()}`; use e.g. `Gold 100, Laranite 250`")
+        if not match.group(2).isdigit() or int(match.group(2)) <= 0:
+            raise ValueError(f"`{part.strip()}`: amounts must be whole, positive SCU")
+        items.append((match.group(1), int(match.group(2))))
+    return items
+
+
+@dataclass
+class Sale:
+    terminal: int
+    commodity: int
+    scu: int
+    price: float
+
+    @property
+    def value(self):
+        return self.scu * self.price
+
+
+@dataclass
+class SalePlan:
+    terminals: list           # terminal details (TERMINAL_FIELDS), indexed by Sale.terminal
+    commodities: list         # commodity names, indexed by Sale.commodity
+    sales: list = field(default_factory=list)
+    unsold: dict = field(default_factory=dict)  # commodity name -> SCU nobody in the plan buys
+    exact: bool = True        # False when the stops were chosen heuristically
+
+    @property
+    def total(self):
+        return sum(sale.value for sale in self.sales)
+
+    @property
+    def stops(self):
+        return sorted({sale.terminal for sale in self.sales})
+
+
+class SaleProblem:
+    """Where to sell a mixed hold: terminal x commodity sell prices and demand
+
+    price[t, c]  what terminal t pays for c (0 where it doesn't buy it)
+    demand[t, c] SCU of c terminal t will take (inf when unknown)
+    amount[c]    SCU of c in the hold
+
+    With unlimited stops each commodity is independent: fill the best-paying terminals in
+    order until the hold or their demand runs out, which is optimal. Limiting the stops makes
+    it a choice of terminal set whose value (that same fill, restricted to the set) is
+    monotone submodular; small instances are solved exactly by scoring every set, larger
+    ones greedily (within 1 - 1/e of optimal) and then improved by single swaps.
+    """
+
+    def __init__(self, cargo, rows_by_commodity):
+        terminals = {}
+        for rows in rows_by_commodity:
+            for row in rows:
+                if row.get("id_terminal") is not None and (row.get("price_sell") or 0) > 0:
+                    terminals.setdefault(row["id_terminal"], {k: row.get(k) for k in TERMINAL_FIELDS})
+        self.terminals = list(terminals.values())
+        t_index = {tid: i for i, tid in enumerate(terminals)}
+
+        self.commodities = [name for name, _ in cargo]
+        self.amount = np.array([scu for _, scu in cargo], dtype=np.float64)
+        shape = (len(self.terminals), len(cargo))
+        self.price = np.zeros(shape, dtype=np.float64)
+        self.demand = np.full(shape, np.inf, dtype=np.float64)
+        for c, rows in enumerate(rows_by_commodity):
+            for row in rows:
+                t = t_index.get(row.get("id_terminal"))
+                if t is None or (row.get("price_sell") or 0) <= 0:
+                    continue
+                self.price[t, c] = row["price_sell"]
+                # UEX reports 0 when the demand is unknown, so only trust positive values. Whole SCU
+                # only, so demand-limited fills (and what's left unsold) stay integral
+                if (row.get("scu_sell") or 0) > 0:
+                    self.demand[t, c] = math.floor(row["scu_sell"])
+
+    def _fill(self, sets):
+        """SCU sold per (set, slot, commodity) when each set of terminals is filled best price first"""
+        prices, demand = self.price[sets], self.demand[sets]  # (sets, slots, commodities)
+        order = np.argsort(-prices, axis=1, kind="stable")
+        prices = np.take_along_axis(prices, order, axis=1)
+        demand = np.take_along_axis(demand, order, axis=1)
+        before = np.concatenate([np.zeros_like(demand[:, :1]), np.cumsum(demand, axis=1)[:, :-1]], axis=1)
+        sold = np.clip(self.amount - before, 0, demand)
+        sold[prices <= 0] = 0
+        return sold, prices, np.take_along_axis(np.broadcast_to(sets[:, :, None], order.shape), order, axis=1)
+
+    def value(self, sets):
+        sold, prices, _ = self._fill(sets)
+        return (sold * prices).sum(axis=(1, 2))
+
+    def choose_stops(self, max_stops):
+        """(terminal indexes, exact) maximizing the sale value with at most `max_stops` terminals"""
+        n = len(self.terminals)
+        k = min(max_stops or n, n)
+        if k == n:
+            return list(range(n)), True
+
+        if math.comb(n, k) <= EXHAUSTIVE_LIMIT:
+            sets = np.array(list(itertools.combinations(range(n), k)), dtype=np.intp)
+            return list(sets[int(np.argmax(self.value(sets)))]), True
+
+        chosen = []
+        for _ in range(k):
+            candidates = np.array([t for t in range(n) if t not in chosen], dtype=np.intp)
+            sets = np.column_stack([np.tile(chosen, (len(candidates), 1)).astype(np.intp), candidates])
+            chosen.append(int(candidates[np.argmax(self.value(sets))]))
+
+        best = self.value(np.array([chosen]))[0]
+        for _ in range(SWAP_ROUNDS):
+            improved = False
+            for slot in range(k):
+                candidates = np.array([t for t in range(n) if t not in chosen], dtype=np.intp)
+                sets = np.tile(chosen, (len(candidates), 1)).astype(np.intp)
+                sets[:, slot] = candidates
+                values = self.value(sets)
+                i = int(np.argmax(values))
+                if values[i] > best + 1e-9:
+                    best, chosen[slot], improved = values[i], int(candidates[i]), True
+            if not improved:
+                break
+        return chosen, False
+
+    def solve(self, max_stops=None):
+        plan = SalePlan(self.terminals, self.commodities)
+        if not self.terminals:
+            plan.unsold = dict(zip(self.commodities, self.amount.astype(int).tolist()))
+            return plan
+
+        stops, plan.exact = self.choose_stops(max_stops)
+        sold, prices, terminals = self._fill(np.array([stops], dtype=np.intp))
+        for slot, c in zip(*np.nonzero(sold[0])):
+            plan.sales.append(Sale(int(terminals[0, slot, c]), int(c), int(sold[0, slot, c]), float(prices[0, slot, c])))
+        plan.sales.sort(key=lambda sale: (sale.terminal, -sale.value))
+
+        remaining = self.amount - sold[0].sum(axis=0)
+        plan.unsold = {self.commodities[c]: int(remaining[c]) for c in np.flatnonzero(remaining > 0)}
+        return plan
+
+
+def plan_sales(cargo, rows_by_commodity, max_stops=None):
+    """Best way to sell `cargo` [(commodity, scu)] given each commodity's UEX terminal price rows"""
+    return SaleProblem(cargo, rows_by_commodity).solve(max_stops)
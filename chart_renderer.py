@@ -0,0 +1,120 @@
+import asyncio
+import io
+import multiprocessing
+import sys
+import types
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def render_trend_chart(commodity_name, dates, price_buy, price_sell):
+    """Render the 7-day buy/sell line chart to PNG bytes (runs in a worker process)"""
+    # Imported here so only the worker processes pay for matplotlib
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    # Object-oriented Agg API: no pyplot global state, safe to run concurrently
+    fig = Figure(figsize=(8, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    ax.plot(dates, price_buy, label="Buy Price", color="green", marker="o", linestyle="--")
+    ax.plot(dates, price_sell, label="Sell Price", color="red", marker="x", linestyle=":")
+
+    # Formatting the x-axis
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment("right")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Price (UEC)")
+    ax.set_title(f"Market Trend for {commodity_name} (Last 7 Days)")
+    ax.legend()
+    ax.grid()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    return buf.getvalue()
+
+
+class _WorkerPool(ProcessPoolExecutor):
+    """Process pool whose spawned workers don't re-import the parent's __main__
+
+    Spawn runs the parent's main module (bot.py, as __mp_main__) in every new worker, which
+    would build a second bot, API client, repository and metrics registry per worker. Workers
+    are only started from submit(), so while it runs __main__ is swapped for an empty module;
+    they then import just what the pickled task names (this module).
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")  # no __file__ or __spec__: nothing to re-run
+        try:
+            return super().submit(fn, *args, **kwargs)
+        finally:
+            sys.modules["__main__"] = main
+
+
+class ChartRenderer:
+    """Renders charts in a process pool and keeps recent PNGs in memory
+
+    Cache keys should include everything the image depends on, e.g.
+    (commodity, data version, chart type), so a new ingest naturally misses.
+    """
+
+    def __init__(self, max_workers=2, maxsize=64):
+        self.max_workers = max_workers
+        self.maxsize = maxsize
+        self._pool = None
+        self._cache = OrderedDict()  # key -> PNG bytes
+        self._inflight = {}          # key -> future, so identical concurrent renders run once
+        self.hits = 0
+        self.misses = 0
+
+    def _get_pool(self):
+        if self._pool is None:
+            # Spawn, not fork: by the first render the bot runs DB, writer, watchdog and server
+            # threads, and forking could copy one of their held locks into the worker
+            self._pool = _WorkerPool(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def get(self, key):
+        """Return a cached PNG or None"""
+        png = self._cache.get(key)
+        if png is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+        return png
+
+    async def render(self, key, func, *args):
+        """Run `func(*args)` in the pool, cache its PNG under `key` and return it"""
+        png = self.get(key)
+        if png is not None:
+            return png
+        self.misses += 1
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(func, *args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        png = await asyncio.shield(future)
+
+        self._cache[key] = png
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return png
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_pool(), func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool and try once more
+            self._pool = None
+            return await loop.run_in_executor(self._get_pool(), func, *args)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
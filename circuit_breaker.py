@@ -0,0 +1,95 @@
+import time
+from collections import deque
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """Stops calling an upstream that is failing or too slow, and probes it back to health
+
+    Closed: every call's outcome goes into a rolling window of the last `window` calls; a call
+    counts as failed when it errors or takes longer than `slow_call` seconds. Once at least
+    `min_calls` are recorded and `failure_ratio` of them failed, the breaker opens.
+    Open: calls are refused for `cooldown` seconds, then the breaker goes half-open.
+    Half-open: up to `probes` calls go through. A success closes the breaker; a failure opens
+    it again with the cooldown doubled, up to `max_cooldown`.
+    """
+
+    def __init__(self, window=20, min_calls=5, failure_ratio=0.5, slow_call=3.0,
+                 cooldown=30.0, max_cooldown=300.0, probes=1):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call = slow_call
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probes = probes
+
+        self.state = CLOSED
+        self.cooldown = cooldown
+        self.opened_at = None
+        self.trips = 0
+        self._outcomes = deque(maxlen=window)  # True = failed
+        self._probes_in_flight = 0
+
+    @property
+    def is_open(self):
+        """True while calls are being refused (open and still cooling down)"""
+        return self.state == OPEN and time.monotonic() < self.opened_at + self.cooldown
+
+    def retry_after(self):
+        """Seconds until the next probe is allowed (0 when calls are allowed now)"""
+        if self.state != OPEN:
+            return 0.0
+        return max(self.opened_at + self.cooldown - time.monotonic(), 0.0)
+
+    def allow(self):
+        """Whether a call may go ahead now; callers must record() the outcome of allowed calls,
+        or cancel_probe() if they give up before there is one"""
+        if self.state == OPEN:
+            if self.is_open:
+                return False
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+            print("🔌 UEX circuit half-open, probing the API.")
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.probes:
+                return False
+            self._probes_in_flight += 1
+        return True
+
+    def cancel_probe(self):
+        """Release an allowed call's slot without a verdict (the caller gave up, not the API)"""
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def record(self, ok, duration=0.0):
+        failed = not ok or duration > self.slow_call
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+            if failed:
+                self._open(min(self.cooldown * 2, self.max_cooldown))
+            else:
+                self._close()
+            return
+        if self.state == OPEN:  # a call allowed before the trip finished; the verdict stands
+            return
+
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls and sum(self._outcomes) >= self.failure_ratio * len(self._outcomes):
+            self._open(self.base_cooldown)
+
+    def _open(self, cooldown):
+        self.state = OPEN
+        self.cooldown = cooldown
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        self._outcomes.clear()
+        print(f"🔌 UEX circuit open; serving local data for {cooldown:.0f}s before probing again.")
+
+    def _close(self):
+        self.state = CLOSED
+        self.cooldown = self.base_cooldown
+        self.opened_at = None
+        self._outcomes.clear()
+        print("🔌 UEX circuit closed, API calls resumed.")
@@ -0,0 +1,185 @@
+import asyncio
+import hmac
+import os
+import socket
+import time
+import uuid
+
+# Where this process accepts notifications from the leader, e.g. http://127.0.0.1:9108
+# (the metrics server hosts the endpoint). Unset for a single process.
+PEER_URL = os.getenv("APT_PEER_URL")
+# Shared secret sent with notifications; peers reject requests without it when set
+CLUSTER_SECRET = os.getenv("APT_CLUSTER_SECRET", "")
+
+NOTIFY_PATH = "/cluster/notify"
+
+# Take the lease when it is free, expired or already ours
+ACQUIRE_LEASE_SQL = """
+    INSERT INTO cluster_leases (name, holder, expires_at) VALUES (?, ?, ?)
+    ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+    WHERE cluster_leases.holder = excluded.holder OR cluster_leases.expires_at < ?
+"""
+
+PEERS_SQL = "SELECT url FROM cluster_peers WHERE holder != ? AND last_seen >= ?"
+
+
+def acquire_lease(conn, name, holder, now, ttl):
+    """Writer-side: take or renew lease `name`; returns True when `holder` owns it"""
+    return conn.execute(ACQUIRE_LEASE_SQL, (name, holder, now + ttl, now)).rowcount == 1
+
+
+def release_lease(conn, name, holder):
+    conn.execute("DELETE FROM cluster_leases WHERE name = ? AND holder = ?", (name, holder))
+
+
+def register_peer(conn, holder, url, now):
+    conn.execute("""
+        INSERT INTO cluster_peers (holder, url, last_seen) VALUES (?, ?, ?)
+        ON CONFLICT (holder) DO UPDATE SET url = excluded.url, last_seen = excluded.last_seen
+    """, (holder, url, now))
+
+
+def remove_peer(conn, holder, stale_before=None):
+    """Drop this process's row, plus any peer not seen since `stale_before`"""
+    conn.execute("DELETE FROM cluster_peers WHERE holder = ? OR last_seen < ?", (holder, stale_before or 0))
+
+
+class Cluster:
+    """Lease-based leader election over the shared database, plus leader -> follower notifications
+
+    Every `renew_every` seconds each process tries to take or renew the `lease` row; whoever
+    holds an unexpired lease is the leader and runs the pollers. `on_change(is_leader)` is
+    called after every tick so callers can (idempotently) start or stop their pollers. A
+    leader that can't renew steps down once its lease would have expired, before anyone
+    else can take it over.
+
+    Processes with a `peer_url` register it; after an ingest the leader POSTs a small JSON
+    notification to every live peer, and followers refresh their caches from the database
+    instead of polling the API themselves.
+    """
+
+    def __init__(self, repo, on_change, lease="pollers", ttl=60.0, renew_every=20.0, peer_url=PEER_URL,
+                 secret=CLUSTER_SECRET):
+        self.repo = repo
+        self.on_change = on_change
+        self.lease = lease
+        self.ttl = ttl
+        self.renew_every = renew_every
+        self.peer_url = peer_url.rstrip("/") if peer_url else None
+        self.secret = secret
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_leader = False
+        self.lease_expires = 0.0
+        self.handlers = {}  # notification kind -> async handler(payload)
+        self.sent = 0
+        self.received = 0
+        self._task = None
+        self._session = None
+
+    # --- Election -----------------------------------------------------------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Cluster lease renewal failed: {e}")
+                if self.is_leader and time.time() >= self.lease_expires - self.renew_every:
+                    await self._set_leader(False)
+            await asyncio.sleep(self.renew_every)
+
+    async def tick(self):
+        now = time.time()
+        leader = await self.repo.write(acquire_lease, self.lease, self.holder, now, self.ttl)
+        if leader:
+            self.lease_expires = now + self.ttl
+        if self.peer_url:
+            await self.repo.write(register_peer, self.holder, self.peer_url, now)
+        await self._set_leader(leader)
+
+    async def _set_leader(self, leader):
+        if leader != self.is_leader:
+            self.is_leader = leader
+            print(f"👑 {self.holder} is now the {'leader' if leader else 'a follower'} for '{self.lease}'.")
+        await self.on_change(leader)
+
+    async def stop(self):
+        """Stop electing and hand the lease over immediately instead of letting it expire"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.repo.is_open:
+            await self.repo.write(release_lease, self.lease, self.holder)
+            await self.repo.write(remove_peer, self.holder, time.time() - 3 * self.ttl)
+        self.is_leader = False
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # --- Notifications ------------------------------------------------------
+
+    def on_notification(self, kind):
+        """Decorator registering the follower-side handler for one notification kind"""
+        def decorator(func):
+            self.handlers[kind] = func
+            return func
+        return decorator
+
+    async def notify(self, kind, **payload):
+        """Leader-side: push `kind` to every peer seen within the last lease period"""
+        if not self.is_leader:
+            return 0
+        rows = await self.repo.fetchall(PEERS_SQL, (self.holder, time.time() - self.ttl), name="cluster_peers")
+        if not rows:
+            return 0
+
+        import aiohttp
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=2))
+        body = dict(payload, kind=kind, sender=self.holder)
+        headers = {"X-APT-Cluster-Secret": self.secret} if self.secret else {}
+
+        async def post(url):
+            try:
+                async with self._session.post(url + NOTIFY_PATH, json=body, headers=headers) as response:
+                    return response.status == 200
+            except Exception as e:
+                print(f"❌ Cluster notification to {url} failed: {e}")
+                return False
+
+        results = await asyncio.gather(*(post(url) for url, in rows))
+        self.sent += sum(results)
+        return sum(results)
+
+    async def handle(self, request):
+        """aiohttp handler for NOTIFY_PATH"""
+        from aiohttp import web
+
+        if self.secret and not hmac.compare_digest(request.headers.get("X-APT-Cluster-Secret", ""), self.secret):
+            return web.json_response({"ok": False}, status=403)
+        payload = await request.json()
+        handler = self.handlers.get(payload.get("kind"))
+        if handler is None:
+            return web.json_response({"ok": False}, status=404)
+        self.received += 1
+        # Answer straight away; the leader shouldn't wait on our cache rebuild
+        asyncio.create_task(self._dispatch(handler, payload))
+        return web.json_response({"ok": True})
+
+    @staticmethod
+    async def _dispatch(handler, payload):
+        try:
+            await handler(payload)
+        except Exception as e:
+            print(f"❌ Cluster notification handler failed: {e}")
+
+    @property
+    def routes(self):
+        return [("POST", NOTIFY_PATH, self.handle)]
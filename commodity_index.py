@@ -0,0 +1,98 @@
+import bisect
+
+# Discord rejects autocomplete responses with more than 25 choices
+MAX_CHOICES = 25
+NGRAM_SIZE = 3
+MIN_SIMILARITY = 0.3
+
+
+def _ngrams(text, n=NGRAM_SIZE):
+    """Return the set of padded character n-grams for a lowercase string"""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class CommodityIndex:
+    """Resident commodity name index used by slash-command autocomplete"""
+
+    def __init__(self):
+        self._names = []      # display names, sorted case-insensitively
+        self._lower = []      # lowercase names, same order as _names
+        self._words = []      # sorted (word, name index) pairs for word-prefix lookups
+        self._grams = {}      # n-gram -> set of name indexes
+        self._gram_counts = []  # number of distinct n-grams per name
+
+    def __len__(self):
+        return len(self._names)
+
+    def rebuild(self, names):
+        """Replace the index contents with a fresh set of commodity names"""
+        unique = sorted({n for n in names if n}, key=str.lower)
+        lower = [n.lower() for n in unique]
+        words = []
+        grams = {}
+        gram_counts = []
+        for idx, name in enumerate(lower):
+            for word in name.split():
+                words.append((word, idx))
+            name_grams = _ngrams(name)
+            gram_counts.append(len(name_grams))
+            for gram in name_grams:
+                grams.setdefault(gram, set()).add(idx)
+        words.sort()
+
+        # Swap everything in at once so lookups never see a half-built index
+        self._names, self._lower, self._words = unique, lower, words
+        self._grams, self._gram_counts = grams, gram_counts
+
+    def search(self, query, limit=MAX_CHOICES):
+        """Return up to `limit` names ranked exact > prefix > word prefix > substring > fuzzy"""
+        query = (query or "").strip().lower()
+        names, lower = self._names, self._lower
+        if not query:
+            return names[:limit]
+
+        ranked = {}
+
+        def rank(idx, score):
+            if score < ranked.get(idx, (99,))[0]:
+                ranked[idx] = (score, lower[idx])
+
+        # Whole-name prefix matches are a contiguous run in the sorted list
+        pos = bisect.bisect_left(lower, query)
+        while pos < len(lower) and lower[pos].startswith(query):
+            rank(pos, 0 if lower[pos] == query else 1)
+            pos += 1
+
+        # Prefix of any word, e.g. "ore" -> "Agricium (Ore)"
+        words = self._words
+        pos = bisect.bisect_left(words, (query,))
+        while pos < len(words) and words[pos][0].startswith(query):
+            rank(words[pos][1], 2)
+            pos += 1
+
+        # Queries shorter than an n-gram only share padded edge grams, so scan for substrings directly
+        if len(query) < NGRAM_SIZE:
+            for idx, name in enumerate(lower):
+                if query in name:
+                    rank(idx, 3)
+
+        # N-gram candidates cover substrings as well as typos
+        query_grams = _ngrams(query)
+        shared = {}
+        for gram in query_grams:
+            for idx in self._grams.get(gram, ()):
+                shared[idx] = shared.get(idx, 0) + 1
+        for idx, count in shared.items():
+            if query in lower[idx]:
+                rank(idx, 3)
+                continue
+            similarity = 2 * count / (len(query_grams) + self._gram_counts[idx])
+            if similarity >= MIN_SIMILARITY:
+                # Lower score sorts first, so invert similarity into (4, 5]
+                rank(idx, 5 - similarity)
+
+        best = sorted(ranked.items(), key=lambda item: item[1])[:limit]
+        return [names[idx] for idx, _ in best]
@@ -0,0 +1,225 @@
+import datetime
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+from migrations import migrate
+
+DB_PATH = 'organizations.db'
+
+# Applied to every connection. journal_mode=WAL is persistent in the file; the rest are per-connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def connect(path=None):
+    """Open a sqlite3 connection with the bot's pragmas applied"""
+    conn = sqlite3.connect(path or DB_PATH)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+@contextmanager
+def transaction(conn):
+    """BEGIN IMMEDIATE ... COMMIT, or join the caller's transaction if one is already open"""
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+# Database setup
+def setup_db():
+    conn = connect()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+
+
+# Hot read queries, kept here so they can be checked with EXPLAIN QUERY PLAN (see __main__)
+COMMODITY_NAMES_SQL = "SELECT name FROM commodities"
+
+LATEST_PRICE_SQL = """
+    SELECT price_buy, price_sell, COALESCE(weight_scu, 0), COALESCE(last_seen, timestamp)
+    FROM commodity_prices
+    WHERE commodity_name = ?
+    ORDER BY timestamp DESC
+    LIMIT 1
+"""
+
+# Daily points for /market_trend: (day, mean buy, mean sell)
+DAILY_TREND_SQL = """
+    SELECT r.bucket, r.sum_buy / r.samples, r.sum_sell / r.samples
+    FROM price_rollups_daily r
+    JOIN commodities c ON c.commodity_id = r.commodity_id
+    WHERE c.name = ? AND r.bucket >= date('now', ?)
+    ORDER BY r.bucket ASC
+"""
+
+# Terminal-level rows shaped like the UEX `commodities_prices` payload
+TERMINAL_PRICES_SQL = """
+    SELECT c.name AS commodity_name, t.terminal_id AS id_terminal, t.terminal_name, t.star_system_name,
+           t.planet_name, t.city_name, t.faction_name, p.price_buy, p.price_sell, p.scu_buy, p.scu_sell,
+           p.updated_at
+    FROM terminal_prices p
+    JOIN commodities c ON c.commodity_id = p.commodity_id
+    JOIN terminals t ON t.terminal_id = p.terminal_id
+"""
+
+COMMODITY_TERMINAL_PRICES_SQL = TERMINAL_PRICES_SQL + " WHERE c.name = ?"
+
+RETENTION_SQL = "DELETE FROM commodity_prices WHERE last_seen < datetime(?, '-7 days')"
+
+# Rollups outlive the raw rows: (table, bucket format, retention)
+ROLLUPS = (
+    ("price_rollups_hourly", "%Y-%m-%d %H:00:00", "-90 days"),
+    ("price_rollups_daily", "%Y-%m-%d", "-730 days"),
+)
+
+ROLLUP_UPSERT_SQL = """
+    INSERT INTO {table} (commodity_id, bucket, open_sell, high_sell, low_sell, close_sell, sum_buy, sum_sell, samples)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+    ON CONFLICT (commodity_id, bucket) DO UPDATE SET
+        high_sell = max(high_sell, excluded.high_sell),
+        low_sell = min(low_sell, excluded.low_sell),
+        close_sell = excluded.close_sell,
+        sum_buy = sum_buy + excluded.sum_buy,
+        sum_sell = sum_sell + excluded.sum_sell,
+        samples = samples + 1
+"""
+
+# Latest stored row per commodity, via the dimension table's pointer
+INGEST_LATEST_SQL = """
+    SELECT c.name, c.commodity_id, p.id, p.price_buy, p.price_sell, p.weight_scu, date(p.timestamp)
+    FROM commodities c
+    LEFT JOIN commodity_prices p ON p.id = c.latest_price_id
+"""
+
+
+def store_commodity_prices(conn, commodities, now):
+    """Write one ingest snapshot in a single transaction, adding rows only for changed prices
+
+    `commodities` are (name, price_buy, price_sell, weight_scu) tuples and `now` is a
+    'YYYY-MM-DD HH:MM:SS' UTC string. An unchanged commodity bumps `samples`/`last_seen` on
+    its latest row instead; a new row is still started each day so daily averages stay exact.
+    Every commodity is also folded into the hourly and daily rollups.
+    Returns (inserted, unchanged).
+    """
+    today = now[:10]
+    timestamp = datetime.datetime.strptime(now, "%Y-%m-%d %H:%M:%S")
+    inserts, touches = 0, []
+
+    with transaction(conn):
+        conn.executemany("INSERT OR IGNORE INTO commodities (name) VALUES (?)", [(c[0],) for c in commodities])
+        latest = {row[0]: row for row in conn.execute(INGEST_LATEST_SQL)}
+
+        for name, price_buy, price_sell, weight_scu in commodities:
+            _, commodity_id, price_id, *last_values, last_day = latest[name]
+            if price_id is not None and tuple(last_values) == (price_buy, price_sell, weight_scu) and last_day == today:
+                touches.append((now, price_id))
+                continue
+
+            cursor = conn.execute(
+                "INSERT INTO commodity_prices (commodity_id, commodity_name, price_buy, price_sell, weight_scu, timestamp, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (commodity_id, name, price_buy, price_sell, weight_scu, now, now)
+            )
+            conn.execute("UPDATE commodities SET latest_price_id = ? WHERE commodity_id = ?", (cursor.lastrowid, commodity_id))
+            inserts += 1
+
+        conn.executemany(
+            "UPDATE commodity_prices SET samples = samples + 1, last_seen = ? WHERE id = ?",
+            touches
+        )
+
+        for table, bucket_format, keep in ROLLUPS:
+            bucket = timestamp.strftime(bucket_format)
+            conn.executemany(ROLLUP_UPSERT_SQL.format(table=table), [
+                (latest[name][1], bucket, price_sell, price_sell, price_sell, price_sell, price_buy, price_sell)
+                for name, price_buy, price_sell, _ in commodities
+            ])
+            conn.execute(f"DELETE FROM {table} WHERE bucket < strftime(?, ?, ?)", (bucket_format, now, keep))
+
+        # Remove data older than 7 days
+        conn.execute(RETENTION_SQL, (now,))
+
+    return inserts, len(touches)
+
+
+def store_terminal_prices(conn, rows, now):
+    """Upsert a terminal price sweep; returns the number of price rows written
+
+    `rows` are UEX `commodities_prices` records. Terminals that no longer list a swept
+    commodity are dropped for that commodity; commodities that weren't swept keep their rows.
+    """
+    rows = [r for r in rows if r.get("id_terminal") is not None and r.get("commodity_name")]
+    names = {r["commodity_name"] for r in rows}
+
+    with transaction(conn):
+        conn.executemany("INSERT OR IGNORE INTO commodities (name) VALUES (?)", [(n,) for n in names])
+        ids = dict(conn.execute("SELECT name, commodity_id FROM commodities"))
+
+        conn.executemany("""
+            INSERT INTO terminals (terminal_id, terminal_name, star_system_name, planet_name, city_name, faction_name)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (terminal_id) DO UPDATE SET
+                terminal_name = excluded.terminal_name, star_system_name = excluded.star_system_name,
+                planet_name = excluded.planet_name, city_name = excluded.city_name,
+                faction_name = excluded.faction_name
+        """, list({r["id_terminal"]: (r["id_terminal"], r.get("terminal_name"), r.get("star_system_name"),
+                                      r.get("planet_name"), r.get("city_name"), r.get("faction_name"))
+                   for r in rows}.values()))
+
+        conn.executemany("""
+            INSERT OR REPLACE INTO terminal_prices (commodity_id, terminal_id, price_buy, price_sell, scu_buy, scu_sell, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(ids[r["commodity_name"]], r["id_terminal"], r.get("price_buy") or 0, r.get("price_sell") or 0,
+               r.get("scu_buy"), r.get("scu_sell"), now) for r in rows])
+
+        conn.executemany(
+            "DELETE FROM terminal_prices WHERE commodity_id = ? AND updated_at < ?",
+            [(ids[n], now) for n in names]
+        )
+
+    return len(rows)
+
+
+def explain_hot_queries(conn):
+    """Yield (sql, plan lines) for every hot query so index use can be checked"""
+    queries = [
+        (COMMODITY_NAMES_SQL, ()),
+        (LATEST_PRICE_SQL, ("Gold",)),
+        (DAILY_TREND_SQL, ("Gold", "-7 days")),
+        (INGEST_LATEST_SQL, ()),
+        (COMMODITY_TERMINAL_PRICES_SQL, ("Gold",)),
+        (RETENTION_SQL, ("now",)),
+        ("UPDATE commodity_prices SET samples = samples + 1, last_seen = ? WHERE id = ?", ("now", 1)),
+    ]
+    for sql, params in queries:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        yield " ".join(sql.split()), plan
+
+
+if __name__ == "__main__":
+    # python database.py [path]: migrate a database in place and print the hot query plans
+    if len(sys.argv) > 1:
+        DB_PATH = sys.argv[1]
+    setup_db()
+    conn = connect()
+    for sql, plan in explain_hot_queries(conn):
+        print(sql)
+        for line in plan:
+            print(f"    {line}")
+    conn.close()
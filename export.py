@@ -0,0 +1,186 @@
+"""Stream price history out of organizations.db as gzip CSV (or Parquet when pyarrow is installed)
+
+    python export.py --source hourly --commodity Gold --since 2025-01-01 -o gold.csv.gz
+    python export.py --format parquet --part-size 8 -o prices.parquet
+
+Rows are read through one cursor in CHUNK_ROWS batches and written as they arrive, so memory
+use doesn't grow with the date range. With a part size, output rolls over into numbered,
+self-contained files (each with its own header) of at most that size.
+"""
+import argparse
+import csv
+import datetime
+import gzip
+import io
+import os
+import sys
+
+import database
+import metrics
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet export is optional
+    pyarrow = None
+
+CHUNK_ROWS = 5000
+
+# Raw rows are kept for 7 days, hourly rollups for 90 and daily rollups for two years (see database.ROLLUPS).
+# source -> (select, commodity column, time column, (order, order for one commodity), output columns).
+# Filters are only added when given, and both orders follow an index, so rows stream without sorting the whole range
+SOURCES = {
+    "raw": ("""
+        SELECT commodity_name, timestamp, last_seen, samples, price_buy, price_sell, weight_scu
+        FROM commodity_prices
+    """, "commodity_name", "timestamp", ("id", "timestamp, id"),
+        ("commodity", "timestamp", "last_seen", "samples", "price_buy", "price_sell", "weight_scu")),
+}
+for _source, _table in (("hourly", "price_rollups_hourly"), ("daily", "price_rollups_daily")):
+    SOURCES[_source] = (f"""
+        SELECT c.name, r.bucket, r.open_sell, r.high_sell, r.low_sell, r.close_sell,
+               r.sum_buy / r.samples, r.sum_sell / r.samples, r.samples
+        FROM {_table} r
+        JOIN commodities c ON c.commodity_id = r.commodity_id
+    """, "c.name", "r.bucket", ("r.bucket, c.name", "r.bucket"),
+        ("commodity", "bucket", "open_sell", "high_sell", "low_sell", "close_sell", "mean_buy", "mean_sell", "samples"))
+
+
+def build_query(source, commodity=None, since=None, until=None):
+    """(sql, params, output columns) for one source and optional commodity / inclusive day range"""
+    if source not in SOURCES:
+        raise ValueError(f"Unknown source `{source}`; choose one of {', '.join(SOURCES)}")
+    select, commodity_column, time_column, orders, columns = SOURCES[source]
+    conditions, params = [], []
+    if commodity:
+        conditions.append(f"{commodity_column} = ?")
+        params.append(commodity)
+    for day, condition in ((since, f"{time_column} >= ?"), (until, f"{time_column} < date(?, '+1 day')")):
+        if day:
+            try:
+                params.append(datetime.date.fromisoformat(day).isoformat())
+            except ValueError:
+                raise ValueError(f"`{day}` isn't a date; use YYYY-MM-DD") from None
+            conditions.append(condition)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"{select} {where} ORDER BY {orders[1] if commodity else orders[0]}", params, columns
+
+
+FORMATS = ("csv", "parquet") if pyarrow is not None else ("csv",)
+EXTENSIONS = {"csv": ".csv.gz", "parquet": ".parquet"}
+
+
+class _CSVPart:
+    def __init__(self, path, columns):
+        self.raw = open(path, "wb")
+        self.text = io.TextIOWrapper(gzip.GzipFile(fileobj=self.raw, mode="wb", compresslevel=6), encoding="utf-8", newline="")
+        self.writer = csv.writer(self.text)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.text.flush()
+
+    def size(self):
+        return self.raw.tell()
+
+    def close(self):
+        self.text.close()
+        self.raw.close()
+
+
+class _ParquetPart:
+    def __init__(self, path, columns):
+        self.columns = columns
+        self.sink = pyarrow.OSFile(path, "wb")
+        self.writer = None
+
+    def write(self, rows):
+        table = pyarrow.Table.from_pydict({name: list(values) for name, values in zip(self.columns, zip(*rows))})
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.sink, table.schema, compression="zstd")
+        self.writer.write_table(table)  # one row group per chunk
+
+    def size(self):
+        return self.sink.tell()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.sink.close()
+
+
+def part_path(path, index):
+    """prices.csv.gz -> prices.001.csv.gz"""
+    for extension in EXTENSIONS.values():
+        if path.endswith(extension):
+            return f"{path[:-len(extension)]}.{index:03d}{extension}"
+    return f"{path}.{index:03d}"
+
+
+def export_prices(path, source="raw", fmt="csv", commodity=None, since=None, until=None,
+                  part_size=None, max_parts=None, db_path=None):
+    """Write matching rows to `path` (or numbered parts of at most `part_size` bytes).
+
+    Blocking; run it in a thread from the bot. Returns (paths, rows, complete) where complete
+    is False when `max_parts` was reached before the rows ran out.
+    """
+    if fmt not in FORMATS:
+        raise ValueError("Parquet export needs pyarrow installed" if fmt == "parquet" else f"Unknown format `{fmt}`")
+    sql, params, columns = build_query(source, commodity, since, until)
+    part_class = _ParquetPart if fmt == "parquet" else _CSVPart
+
+    conn = database.connect(db_path)
+    conn.execute("PRAGMA query_only=1")
+    paths, part, rows, complete = [], None, 0, True
+    try:
+        with metrics.db_query_seconds.time(query=f"export_{source}", kind="read"):
+            cursor = conn.execute(sql, params)
+            last_chunk = 0  # compressed bytes the previous chunk added, to keep parts under part_size
+            while True:
+                chunk = cursor.fetchmany(CHUNK_ROWS)
+                if not chunk:
+                    break
+                if part is not None and part_size and part.size() + last_chunk * 1.5 > part_size:
+                    part.close()
+                    part = None
+                if part is None:
+                    if max_parts and len(paths) >= max_parts:
+                        complete = False
+                        break
+                    paths.append(part_path(path, len(paths) + 1) if part_size else path)
+                    part = part_class(paths[-1], columns)
+                before = part.size()
+                part.write(chunk)
+                last_chunk = part.size() - before
+                rows += len(chunk)
+            if part is None and not paths:  # no rows: still produce a file with the header
+                paths.append(path)
+                part = part_class(path, columns)
+    finally:
+        if part is not None:
+            part.close()
+        conn.close()
+    if len(paths) == 1 and paths[0] != path:  # everything fit in one part: drop the part number
+        os.replace(paths[0], path)
+        paths = [path]
+    return paths, rows, complete
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export price history")
+    parser.add_argument("--source", choices=list(SOURCES), default="raw", help="raw rows (7 days) or hourly/daily rollups")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--commodity", help="only this commodity (exact name)")
+    parser.add_argument("--since", help="first day to include, YYYY-MM-DD")
+    parser.add_argument("--until", help="last day to include, YYYY-MM-DD")
+    parser.add_argument("--part-size", type=float, help="split into parts of at most this many MiB")
+    parser.add_argument("--db", default=database.DB_PATH, help="database file")
+    parser.add_argument("-o", "--output", help="output file (default: prices_<source> + extension)")
+    args = parser.parse_args()
+
+    output = args.output or f"prices_{args.source}{EXTENSIONS[args.format]}"
+    paths, rows, _ = export_prices(output, args.source, args.format, args.commodity, args.since, args.until,
+                                   part_size=int(args.part_size * 1024 * 1024) if args.part_size else None,
+                                   db_path=args.db)
+    print(f"✅ Exported {rows} rows to {', '.join(paths)}", file=sys.stderr)
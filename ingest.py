@@ -0,0 +1,64 @@
+import datetime
+import traceback
+from dataclasses import dataclass, field
+
+from uex_client import UEXError
+
+
+@dataclass
+class CommoditySnapshot:
+    """One parsed `/commodities` payload, shared by every consumer of an ingest cycle"""
+    commodities: list
+    fetched_at: datetime.datetime = field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+
+    def priced(self):
+        """Commodities with a name and both a buy and a sell price"""
+        return [c for c in self.commodities if c.get("name") and c.get("price_buy") and c.get("price_sell")]
+
+
+class IngestPipeline:
+    """Fetches `/commodities` once per cycle and fans the snapshot out to consumers"""
+
+    def __init__(self, client):
+        self.client = client
+        self.consumers = []
+        self.last_snapshot = None
+        # Bumped after every delivered snapshot; caches key derived data on it
+        self.version = 0
+
+    def consumer(self, func):
+        """Register an `async def consumer(snapshot)`; consumers run in registration order"""
+        self.consumers.append(func)
+        return func
+
+    async def fetch(self):
+        try:
+            data = await self.client.commodities()
+        except UEXError as e:
+            print(f"❌ Failed to fetch commodity data: {e}")
+            return None
+
+        if data.get("status") != "ok" or not data.get("data"):
+            print("❌ Failed to fetch valid data. API response status not 'ok'.")
+            return None
+        return CommoditySnapshot(data["data"])
+
+    async def run_once(self):
+        """Fetch one snapshot and deliver it to every consumer; returns the snapshot or None"""
+        snapshot = await self.fetch()
+        if snapshot is None:
+            return None
+        print(f"✅ Fetched {len(snapshot.commodities)} commodities.")
+
+        # Consumers run sequentially so later ones (alerts, caches) see what earlier ones stored,
+        # and one failing consumer doesn't stop the rest
+        for consumer in self.consumers:
+            try:
+                await consumer(snapshot)
+            except Exception:
+                print(f"❌ Ingest consumer {consumer.__name__} failed:")
+                traceback.print_exc()
+
+        self.last_snapshot = snapshot
+        self.version += 1
+        return snapshot
@@ -0,0 +1,203 @@
+import asyncio
+import random
+import time
+
+# Every member and their points for one organization (loaded once per org, then kept up to date)
+ORG_POINTS_SQL = """
+    SELECT m.user_id, m.points
+    FROM orgs o
+    JOIN org_members m ON m.org_id = o.org_id
+    WHERE o.name = ?
+"""
+
+
+class _Node:
+    __slots__ = ("key", "priority", "size", "left", "right")
+
+    def __init__(self, key, priority):
+        self.key = key
+        self.priority = priority
+        self.size = 1
+        self.left = None
+        self.right = None
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+
+def _split(node, key):
+    """(keys < key, keys >= key)"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        return _update(node), right
+    left, node.left = _split(node.left, key)
+    return left, _update(node)
+
+
+def _merge(left, right):
+    """Join two treaps where every key in `left` is below every key in `right`"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+class RankTree:
+    """Order-statistic treap of one organization's members, best first
+
+    Keys are (-points, user_id), so in-order position is leaderboard position and ties are
+    broken by user id. Updating a member's points, their rank and the member at position i
+    are all O(log n); ranks are competition style (equal points share a rank).
+    """
+
+    def __init__(self, members=()):
+        self._points = dict(members)  # user_id -> points
+        self._root = self._build(sorted((-p, u) for u, p in self._points.items()))
+
+    @staticmethod
+    def _build(keys):
+        """Balanced tree from sorted keys in O(n); priorities fall with depth, so it's a valid treap"""
+        def build(lo, hi, depth):
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            node = _Node(keys[mid], -depth + random.random() * 0.5)
+            node.left = build(lo, mid, depth + 1)
+            node.right = build(mid + 1, hi, depth + 1)
+            return _update(node)
+        return build(0, len(keys), 0)
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, user_id):
+        return user_id in self._points
+
+    def set(self, user_id, points):
+        self.remove(user_id)
+        self._points[user_id] = points
+        left, right = _split(self._root, (-points, user_id))
+        self._root = _merge(_merge(left, _Node((-points, user_id), random.random())), right)
+
+    def remove(self, user_id):
+        points = self._points.pop(user_id, None)
+        if points is None:
+            return
+        left, rest = _split(self._root, (-points, user_id))
+        _, right = _split(rest, (-points, user_id + 1))
+        self._root = _merge(left, right)
+
+    def _count_above(self, points):
+        """Members with strictly more points"""
+        key, node, count = (-points, float("-inf")), self._root, 0
+        while node is not None:
+            if node.key < key:
+                count += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def _select(self, index):
+        node = self._root
+        while node is not None:
+            left = _size(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node.key
+            else:
+                index -= left + 1
+                node = node.right
+        raise IndexError(index)
+
+    def rank(self, user_id):
+        """(rank, points) for a member, or None"""
+        points = self._points.get(user_id)
+        if points is None:
+            return None
+        return self._count_above(points) + 1, points
+
+    def page(self, start, count):
+        """[(rank, user_id, points)] for positions start .. start + count - 1"""
+        entries = []
+        for index in range(start, min(start + count, len(self._points))):
+            neg_points, user_id = self._select(index)
+            entries.append((self._count_above(-neg_points) + 1, user_id, -neg_points))
+        return entries
+
+
+class Leaderboards:
+    """Per-organization RankTrees, loaded from the database on first use
+
+    The process's own point changes are applied in place (set_points / discard). Writes made
+    by other processes sharing the database show up once a tree is older than `max_age`.
+    """
+
+    def __init__(self, load, max_age=300.0, maxsize=64):
+        self.load = load  # async (org_name) -> [(user_id, points)] or None when the org doesn't exist
+        self.max_age = max_age
+        self.maxsize = maxsize
+        self._trees = {}        # lower-case org name -> (RankTree, loaded_at)
+        self._generation = {}   # lower-case org name -> change counter, so racing loads don't store stale trees
+        self._inflight = {}
+        self.loads = 0
+
+    async def get(self, org_name):
+        """The org's RankTree, or None when it doesn't exist"""
+        key = org_name.lower()
+        entry = self._trees.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.max_age:
+            return entry[0]
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, org_name))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key, org_name):
+        generation = self._generation.get(key, 0)
+        try:
+            members = await self.load(org_name)
+            self.loads += 1
+            if members is None:
+                return None
+            tree = RankTree(members)
+            if self._generation.get(key, 0) == generation:
+                self._trees[key] = (tree, time.monotonic())
+                while len(self._trees) > self.maxsize:
+                    self._trees.pop(next(iter(self._trees)))
+            return tree
+        finally:
+            self._inflight.pop(key, None)
+
+    def set_points(self, org_name, totals):
+        """Apply new point totals [(user_id, points)] in O(log n) each, if the org is loaded"""
+        key = org_name.lower()
+        self._generation[key] = self._generation.get(key, 0) + 1
+        entry = self._trees.get(key)
+        if entry is not None:
+            for user_id, points in totals:
+                entry[0].set(user_id, points)
+
+    def discard(self, org_name):
+        """Forget an org after membership changes; the next lookup reloads it"""
+        key = org_name.lower()
+        self._generation[key] = self._generation.get(key, 0) + 1
+        self._trees.pop(key, None)
+
+    def __len__(self):
+        return len(self._trees)
@@ -0,0 +1,214 @@
+import bisect
+import functools
+import os
+import re
+import time
+from contextlib import contextmanager
+
+# Local Prometheus scrape endpoint; APT_METRICS_PORT=0 disables it
+METRICS_HOST = os.getenv("APT_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("APT_METRICS_PORT", "9108"))
+
+# Seconds; covers a cached read (~0.1 ms) up to a slow UEX call with retries
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, as Prometheus expects it"""
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # key -> [per-bucket counts (+inf last), sum, count]
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q, **labels):
+        """Approximate quantile (upper bound of the bucket it falls in); None without samples"""
+        series = self.series.get(_label_key(self.labelnames, labels))
+        if not series or not series[2]:
+            return None
+        target, seen = q * series[2], 0
+        for bound, count in zip(self.buckets + (float("inf"),), series[0]):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def summary(self):
+        """[(labels, count, mean, approx p95)] per label set, most total time first"""
+        rows = []
+        for key, (_, total, count) in sorted(self.series.items(), key=lambda item: -item[1][1]):
+            labels = dict(zip(self.labelnames, key))
+            rows.append((labels, count, total / count if count else 0.0, self.quantile(0.95, **labels)))
+        return rows
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class Gauge:
+    """Value read from `collect()` at scrape time: a number, or {label value tuple: number}"""
+
+    def __init__(self, name, help, collect, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.collect = collect
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.metrics.get(name) or self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.metrics.get(name) or self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, collect, labelnames=()):
+        return self._add(Gauge(name, help, collect, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:  # a broken gauge callback shouldn't take down the whole scrape
+                lines.append(f"# {metric.name} unavailable: {e}")
+        return "\n".join(lines) + "\n"
+
+
+# Module-level registry shared by every instrumented module
+registry = Registry()
+
+command_seconds = registry.histogram("apt_command_seconds", "Slash command latency", ("command", "status"))
+uex_request_seconds = registry.histogram("apt_uex_request_seconds", "UEX API request latency per attempt", ("endpoint", "status"))
+uex_response_bytes = registry.counter("apt_uex_response_bytes_total", "UEX API response bytes", ("endpoint",))
+db_query_seconds = registry.histogram("apt_db_query_seconds", "Database query latency", ("query", "kind"))
+task_seconds = registry.histogram("apt_task_seconds", "Task loop iteration latency", ("task", "status"))
+
+
+_FROM_RE = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=256)
+def query_label(sql):
+    """Short, stable label for ad-hoc SQL: the statement verb and first table"""
+    verb = sql.split(None, 1)[0].lower() if sql.strip() else "sql"
+    table = _FROM_RE.search(sql)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+def timed_task(name):
+    """Record every iteration of a tasks.loop coroutine in task_seconds"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start, status = time.perf_counter(), "ok"
+            try:
+                return await func(*args, **kwargs)
+            except BaseException:
+                status = "error"
+                raise
+            finally:
+                task_seconds.observe(time.perf_counter() - start, task=name, status=status)
+        return wrapper
+    return decorator
+
+
+async def start_server(host=METRICS_HOST, port=METRICS_PORT, routes=()):
+    """Serve registry.render() at /metrics, plus any extra (method, path, handler) `routes`
+
+    Returns the aiohttp runner (None when disabled).
+    """
+    if not port:
+        return None
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    for method, path, handler in routes:
+        app.router.add_route(method, path, handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        print(f"❌ Metrics endpoint not started on {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    print(f"✅ Metrics available at http://{host}:{port}/metrics")
+    return runner
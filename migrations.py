@@ -0,0 +1,329 @@
+# Versioned schema migrations for organizations.db
+#
+# Each migration runs once, in version order, inside its own transaction, and is recorded in
+# schema_version. Never edit a migration that has shipped; add a new one instead.
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register `func(conn)` as schema migration `version`"""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return register
+
+
+def schema_version(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Bring the database up to the latest schema version; returns the versions applied"""
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while we waited for the write lock
+            if version <= conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]:
+                continue
+            apply(conn)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (version, description))
+        applied.append(version)
+        print(f"✅ Applied schema migration {version}: {description}")
+    return applied
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+@migration(1, "baseline schema")
+def _baseline(conn):
+    # Databases created before migrations existed already have these tables
+    # Create tables for organizations, members, and ranks
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS organizations (
+        org_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        org_name TEXT,
+        description TEXT,
+        leader_id INTEGER
+    )
+    ''')
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS members (
+        user_id INTEGER,
+        org_name TEXT,
+        role TEXT,
+        points INTEGER,
+        PRIMARY KEY (user_id, org_name),
+        FOREIGN KEY (org_name) REFERENCES organizations(org_name)
+    )
+    ''')
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ranks (
+        rank_name TEXT,
+        org_name TEXT,
+        PRIMARY KEY (rank_name, org_name),
+        FOREIGN KEY (org_name) REFERENCES organizations(org_name)
+    )
+    ''')
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS roles (
+        org_name TEXT,
+        role_name TEXT,
+        income_share REAL DEFAULT 0,
+        PRIMARY KEY (org_name, role_name)
+    )
+""")
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS commodity_prices (
+        id INTEGER PRIMARY KEY,
+        commodity_name TEXT NOT NULL,
+        price_buy REAL,
+        price_sell REAL,
+        weight_scu INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.execute('''\
+    CREATE TABLE IF NOT EXISTS settings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER,
+        channel_id INTEGER
+        )
+    ''')
+
+    # Change-only ingestion: each row stands for `samples` identical observations up to `last_seen`
+    columns = _columns(conn, "commodity_prices")
+    if "samples" not in columns:
+        conn.execute("ALTER TABLE commodity_prices ADD COLUMN samples INTEGER NOT NULL DEFAULT 1")
+    if "last_seen" not in columns:
+        conn.execute("ALTER TABLE commodity_prices ADD COLUMN last_seen DATETIME")
+        conn.execute("UPDATE commodity_prices SET last_seen = timestamp")
+
+
+@migration(2, "commodity_prices indexes")
+def _price_indexes(conn):
+    # /commodity and /market_trend look up one commodity ordered by time
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_commodity_prices_name_ts ON commodity_prices (commodity_name, timestamp)")
+    # Retention deletes by last_seen
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_commodity_prices_last_seen ON commodity_prices (last_seen)")
+
+
+@migration(3, "commodities dimension table")
+def _commodities(conn):
+    conn.execute("""
+    CREATE TABLE commodities (
+        commodity_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        latest_price_id INTEGER
+    )
+    """)
+    conn.execute("ALTER TABLE commodity_prices ADD COLUMN commodity_id INTEGER REFERENCES commodities(commodity_id)")
+
+    conn.execute("INSERT INTO commodities (name) SELECT DISTINCT commodity_name FROM commodity_prices")
+    conn.execute("""
+        UPDATE commodity_prices SET commodity_id =
+            (SELECT commodity_id FROM commodities WHERE name = commodity_prices.commodity_name)
+    """)
+    conn.execute("""
+        UPDATE commodities SET latest_price_id =
+            (SELECT MAX(id) FROM commodity_prices WHERE commodity_name = commodities.name)
+    """)
+
+
+@migration(4, "hourly and daily price rollups")
+def _rollups(conn):
+    # OHLC of the sell price plus running sums for mean buy/sell; one row per commodity per bucket
+    for table in ("price_rollups_hourly", "price_rollups_daily"):
+        conn.execute(f"""
+        CREATE TABLE {table} (
+            commodity_id INTEGER NOT NULL REFERENCES commodities(commodity_id),
+            bucket TEXT NOT NULL,
+            open_sell REAL,
+            high_sell REAL,
+            low_sell REAL,
+            close_sell REAL,
+            sum_buy REAL NOT NULL,
+            sum_sell REAL NOT NULL,
+            samples INTEGER NOT NULL,
+            PRIMARY KEY (commodity_id, bucket)
+        ) WITHOUT ROWID
+        """)
+        conn.execute(f"CREATE INDEX idx_{table}_bucket ON {table} (bucket)")
+
+    # Backfill from the raw history. A raw row's samples are all credited to the bucket it started in
+    for table, bucket in (("price_rollups_hourly", "strftime('%Y-%m-%d %H:00:00', timestamp)"),
+                          ("price_rollups_daily", "date(timestamp)")):
+        conn.execute(f"""
+            INSERT INTO {table} (commodity_id, bucket, open_sell, high_sell, low_sell, close_sell, sum_buy, sum_sell, samples)
+            SELECT DISTINCT commodity_id, {bucket},
+                first_value(price_sell) OVER w, max(price_sell) OVER w, min(price_sell) OVER w,
+                last_value(price_sell) OVER w,
+                sum(price_buy * samples) OVER w, sum(price_sell * samples) OVER w, sum(samples) OVER w
+            FROM commodity_prices
+            WHERE commodity_id IS NOT NULL
+            WINDOW w AS (PARTITION BY commodity_id, {bucket} ORDER BY timestamp, id
+                         ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+        """)
+
+
+@migration(5, "terminal price snapshot tables")
+def _terminal_prices(conn):
+    conn.execute("""
+    CREATE TABLE terminals (
+        terminal_id INTEGER PRIMARY KEY,
+        terminal_name TEXT,
+        star_system_name TEXT,
+        planet_name TEXT,
+        city_name TEXT,
+        faction_name TEXT
+    )
+    """)
+    # Latest known price of each commodity at each terminal; terminal details live in `terminals`
+    conn.execute("""
+    CREATE TABLE terminal_prices (
+        commodity_id INTEGER NOT NULL REFERENCES commodities(commodity_id),
+        terminal_id INTEGER NOT NULL REFERENCES terminals(terminal_id),
+        price_buy REAL,
+        price_sell REAL,
+        scu_buy REAL,
+        scu_sell REAL,
+        updated_at DATETIME NOT NULL,
+        PRIMARY KEY (commodity_id, terminal_id)
+    ) WITHOUT ROWID
+    """)
+
+
+@migration(6, "persistent price alert state")
+def _alert_state(conn):
+    # Last sell price each commodity was compared against, and when it last alerted (epoch seconds)
+    conn.execute("""
+    CREATE TABLE alert_state (
+        commodity_id INTEGER PRIMARY KEY REFERENCES commodities(commodity_id),
+        baseline_sell REAL NOT NULL,
+        last_alert_at INTEGER
+    )
+    """)
+
+
+@migration(7, "per-channel alert subscriptions")
+def _alert_subscriptions(conn):
+    # commodity_name '*' subscribes to every commodity; min_change is a fraction, NULL = any alert
+    conn.execute("""
+    CREATE TABLE alert_subscriptions (
+        guild_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        commodity_name TEXT NOT NULL DEFAULT '*',
+        min_change REAL,
+        PRIMARY KEY (channel_id, commodity_name)
+    )
+    """)
+    conn.execute("CREATE INDEX idx_alert_subscriptions_commodity ON alert_subscriptions (commodity_name)")
+    conn.execute("CREATE INDEX idx_alert_subscriptions_guild ON alert_subscriptions (guild_id)")
+    # The old settings table held one alert channel per guild; carry those over as catch-all subscriptions
+    conn.execute("""
+        INSERT OR IGNORE INTO alert_subscriptions (guild_id, channel_id)
+        SELECT guild_id, channel_id FROM settings WHERE guild_id IS NOT NULL AND channel_id IS NOT NULL
+    """)
+
+
+@migration(8, "startup announcement log")
+def _startup_announcements(conn):
+    conn.execute("""
+    CREATE TABLE startup_announcements (
+        guild_id INTEGER PRIMARY KEY,
+        version TEXT NOT NULL,
+        announced_at TEXT NOT NULL
+    )
+    """)
+
+
+@migration(9, "cluster leases and peers")
+def _cluster(conn):
+    conn.execute("""
+    CREATE TABLE cluster_leases (
+        name TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE cluster_peers (
+        holder TEXT PRIMARY KEY,
+        url TEXT NOT NULL,
+        last_seen REAL NOT NULL
+    )
+    """)
+
+
+@migration(10, "integer-keyed organization schema")
+def _organizations(conn):
+    conn.execute("""
+    CREATE TABLE orgs (
+        org_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL COLLATE NOCASE UNIQUE,
+        description TEXT,
+        leader_id INTEGER NOT NULL
+    )
+    """)
+    # Default ranks and custom roles share one table; income_share is a percentage
+    conn.execute("""
+    CREATE TABLE org_roles (
+        role_id INTEGER PRIMARY KEY,
+        org_id INTEGER NOT NULL REFERENCES orgs (org_id),
+        name TEXT NOT NULL COLLATE NOCASE,
+        income_share REAL NOT NULL DEFAULT 0,
+        UNIQUE (org_id, name)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE org_members (
+        org_id INTEGER NOT NULL REFERENCES orgs (org_id),
+        user_id INTEGER NOT NULL,
+        role_id INTEGER NOT NULL REFERENCES org_roles (role_id),
+        points INTEGER NOT NULL DEFAULT 0,
+        joined_at TEXT NOT NULL DEFAULT (datetime('now')),
+        PRIMARY KEY (org_id, user_id)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX idx_org_members_user ON org_members (user_id)")
+    conn.execute("CREATE INDEX idx_org_members_role ON org_members (org_id, role_id)")
+    conn.execute("CREATE INDEX idx_org_members_points ON org_members (org_id, points DESC)")
+
+    # Carry over anything stored in the old org_name-keyed tables (first org wins on duplicate names)
+    conn.execute("""
+        INSERT OR IGNORE INTO orgs (name, description, leader_id)
+        SELECT org_name, description, leader_id FROM organizations
+        WHERE org_name IS NOT NULL AND leader_id IS NOT NULL ORDER BY org_id
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO org_roles (org_id, name, income_share)
+        SELECT o.org_id, r.role_name, COALESCE(r.income_share, 0)
+        FROM (SELECT org_name, role_name, income_share FROM roles
+              UNION ALL SELECT org_name, rank_name, 0 FROM ranks
+              UNION ALL SELECT DISTINCT org_name, role, 0 FROM members WHERE role IS NOT NULL) r
+        JOIN orgs o ON o.name = r.org_name
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO org_members (org_id, user_id, role_id, points)
+        SELECT o.org_id, CAST(m.user_id AS INTEGER), r.role_id, COALESCE(m.points, 0)
+        FROM members m
+        JOIN orgs o ON o.name = m.org_name
+        JOIN org_roles r ON r.org_id = o.org_id AND r.name = COALESCE(m.role, 'Member')
+    """)
@@ -0,0 +1,184 @@
+# Organization helpers. Writers take a sqlite3 connection and run on the repository's
+# writer thread (see Repository.write), which wraps the call in one transaction.
+# Organizations, roles and members are keyed by integer ids; names are only looked up once.
+
+DEFAULT_ROLES = ("Leader", "Officer", "Member")
+
+# Largest (user_id, points) batch bound into one statement (SQLite allows 32766 variables)
+AWARD_BATCH = 10000
+
+ORG_NAMES_SQL = "SELECT name FROM orgs WHERE name LIKE ? || '%' ORDER BY name LIMIT 25"
+
+# Member count and top member come from the leaderboard (see leaderboard.py)
+ORG_INFO_SQL = "SELECT description, leader_id FROM orgs WHERE name = ?"
+
+ORG_ROLES_SQL = """
+    SELECT r.name, r.income_share, COUNT(m.user_id)
+    FROM orgs o
+    JOIN org_roles r ON r.org_id = o.org_id
+    LEFT JOIN org_members m ON m.org_id = r.org_id AND m.role_id = r.role_id
+    WHERE o.name = ?
+    GROUP BY r.role_id
+    ORDER BY r.role_id
+"""
+
+# Income split per role: every member of a role gets the same amount, so the payout is
+# computed per role in SQL and never needs the member list (role, members, each, role total)
+INCOME_DISTRIBUTION_SQL = """
+    WITH shares AS (
+        SELECT r.role_id, r.name, r.income_share, COUNT(*) AS members
+        FROM org_members m
+        JOIN org_roles r ON r.role_id = m.role_id
+        WHERE m.org_id = ? AND r.income_share > 0
+        GROUP BY r.role_id
+    )
+    SELECT name, members,
+           ? * income_share / (SELECT SUM(income_share * members) FROM shares),
+           ? * income_share * members / (SELECT SUM(income_share * members) FROM shares)
+    FROM shares
+    ORDER BY income_share DESC
+"""
+
+ORG_LEADER_SQL = "SELECT org_id, leader_id FROM orgs WHERE name = ?"
+
+
+def _org(conn, org_name):
+    """(org_id, leader_id) or None"""
+    return conn.execute(ORG_LEADER_SQL, (org_name,)).fetchone()
+
+
+# Function to create an organization
+def create_organization(conn, org_name, description, leader_id):
+    cursor = conn.execute("""
+        INSERT INTO orgs (name, description, leader_id) VALUES (?, ?, ?)
+        ON CONFLICT (name) DO NOTHING
+    """, (org_name, description, leader_id))
+    if cursor.rowcount == 0:
+        return f"❌ An organization named `{org_name}` already exists."
+    org_id = cursor.lastrowid
+
+    # Default ranks, then the creator as a member with the 'Leader' rank
+    conn.executemany("INSERT INTO org_roles (org_id, name) VALUES (?, ?)", [(org_id, r) for r in DEFAULT_ROLES])
+    conn.execute("""
+        INSERT INTO org_members (org_id, user_id, role_id)
+        SELECT org_id, ?, role_id FROM org_roles WHERE org_id = ? AND name = 'Leader'
+    """, (leader_id, org_id))
+    return f"✅ Organization `{org_name}` created successfully!"
+
+
+# Function to join an organization
+def join_organization(conn, user_id, org_name):
+    # WHERE before ON CONFLICT keeps SQLite from parsing it as a join constraint
+    joined = conn.execute("""
+        INSERT INTO org_members (org_id, user_id, role_id)
+        SELECT o.org_id, ?, r.role_id
+        FROM orgs o JOIN org_roles r ON r.org_id = o.org_id AND r.name = 'Member'
+        WHERE o.name = ?
+        ON CONFLICT (org_id, user_id) DO NOTHING
+    """, (user_id, org_name)).rowcount
+    if joined:
+        return f"✅ You have joined the organization `{org_name}` as a Member!"
+    if _org(conn, org_name) is None:
+        return f"❌ The organization `{org_name}` does not exist."
+    return f"❌ You are already a member of `{org_name}`."
+
+
+# Function to award points to one or many members in one statement per batch
+def award_points(conn, user_id, org_name, awards):
+    """`awards` is a list of (member_id, points); returns (message, [(member_id, new total)], ids not in the org)"""
+    org = _org(conn, org_name)
+    if org is None:
+        return f"❌ The organization `{org_name}` does not exist.", [], []
+    org_id = org[0]
+    if conn.execute("SELECT 1 FROM org_members WHERE org_id = ? AND user_id = ?", (org_id, user_id)).fetchone() is None:
+        return f"❌ You are not a member of `{org_name}`.", [], []
+
+    totals = {}
+    for member_id, points in awards:
+        totals[member_id] = totals.get(member_id, 0) + points
+    items = list(totals.items())
+
+    # RETURNING hands back the new totals so the leaderboard can be updated without a re-read
+    updated = []
+    for start in range(0, len(items), AWARD_BATCH):
+        batch = items[start:start + AWARD_BATCH]
+        values = ", ".join("(?, ?)" for _ in batch)
+        params = [v for pair in batch for v in pair]
+        updated.extend(conn.execute(f"""
+            UPDATE org_members SET points = org_members.points + awards.points
+            FROM (SELECT column1 AS user_id, column2 AS points FROM (VALUES {values})) AS awards
+            WHERE org_members.org_id = ? AND org_members.user_id = awards.user_id
+            RETURNING org_members.user_id, org_members.points
+        """, params + [org_id]).fetchall())
+
+    found = {member_id for member_id, _ in updated}
+    missing = [member_id for member_id, _ in items if member_id not in found]
+    return f"✅ Points awarded to {len(updated)} member(s) in `{org_name}`.", updated, missing
+
+
+# Function to leave an organization
+def leave_organization(conn, user_id, org_name):
+    org = _org(conn, org_name)
+    left = org is not None and conn.execute(
+        "DELETE FROM org_members WHERE org_id = ? AND user_id = ?", (org[0], user_id)).rowcount
+    if not left:
+        return f"❌ You are not a member of `{org_name}`."
+
+    # If no members remain, delete the organization
+    if conn.execute("SELECT 1 FROM org_members WHERE org_id = ? LIMIT 1", (org[0],)).fetchone() is None:
+        conn.execute("DELETE FROM org_roles WHERE org_id = ?", (org[0],))
+        conn.execute("DELETE FROM orgs WHERE org_id = ?", (org[0],))
+        return f"⚠️ You were the last member. Organization `{org_name}` has been deleted."
+    return f"✅ You have successfully left `{org_name}`."
+
+
+# Leader-only role management. Each is one statement that also checks leadership; the
+# follow-up lookup only runs on failure, to say why.
+def _leader_failure(conn, org_name, leader_id, action):
+    org = _org(conn, org_name)
+    if org is None:
+        return f"❌ The organization `{org_name}` does not exist."
+    if org[1] != leader_id:
+        return f"❌ Only the organization leader can {action}."
+    return None
+
+
+def create_role(conn, leader_id, org_name, role_name):
+    created = conn.execute("""
+        INSERT INTO org_roles (org_id, name)
+        SELECT org_id, ? FROM orgs WHERE name = ? AND leader_id = ?
+        ON CONFLICT (org_id, name) DO NOTHING
+    """, (role_name, org_name, leader_id)).rowcount
+    if created:
+        return f"✅ Role `{role_name}` created successfully in `{org_name}`!"
+    return _leader_failure(conn, org_name, leader_id, "create roles") or "❌ This role already exists in the organization."
+
+
+def assign_role(conn, leader_id, member_id, org_name, role_name):
+    assigned = conn.execute("""
+        UPDATE org_members SET role_id = r.role_id
+        FROM orgs o JOIN org_roles r ON r.org_id = o.org_id
+        WHERE o.name = ? AND o.leader_id = ? AND r.name = ?
+          AND org_members.org_id = o.org_id AND org_members.user_id = ?
+    """, (org_name, leader_id, role_name, member_id)).rowcount
+    if assigned:
+        return f"✅ Assigned role `{role_name}` to <@{member_id}> in `{org_name}`."
+    failure = _leader_failure(conn, org_name, leader_id, "assign roles")
+    if failure:
+        return failure
+    org_id = _org(conn, org_name)[0]
+    if conn.execute("SELECT 1 FROM org_roles WHERE org_id = ? AND name = ?", (org_id, role_name)).fetchone() is None:
+        return "❌ This role does not exist in the organization."
+    return f"❌ <@{member_id}> is not a member of `{org_name}`."
+
+
+def set_income_share(conn, leader_id, org_name, role_name, income_share):
+    updated = conn.execute("""
+        UPDATE org_roles SET income_share = ?
+        FROM orgs o
+        WHERE o.org_id = org_roles.org_id AND o.name = ? AND o.leader_id = ? AND org_roles.name = ?
+    """, (income_share, org_name, leader_id, role_name)).rowcount
+    if updated:
+        return f"✅ Set income share for `{role_name}` in `{org_name}` to {income_share}%."
+    return (_leader_failure(conn, org_name, leader_id, "set income share percentages")
+            or "❌ This role does not exist in the organization.")
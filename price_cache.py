@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class AsyncTTLCache:
+    """Async LRU cache with TTL, stale-while-revalidate and coalesced loads
+
+    `loader(key)` is awaited on a miss. Entries younger than `ttl` are served as-is;
+    entries up to `ttl + stale_ttl` old are served immediately while one background
+    refresh runs. Concurrent misses for the same key share a single loader call.
+    """
+
+    def __init__(self, loader, ttl=120, stale_ttl=600, maxsize=128):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (value, loaded_at)
+        self._inflight = {}            # key -> asyncio.Task running the loader
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, loaded_at = entry
+            age = time.monotonic() - loaded_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._refresh_in_background(key)
+                return value
+
+        self.misses += 1
+        return await self._load(key)
+
+    def _start_load(self, key):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run_loader(key))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        return task
+
+    async def _run_loader(self, key):
+        try:
+            value = await self.loader(key)
+            self._store(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _load(self, key):
+        # shield() so one cancelled caller doesn't cancel the fetch the others are waiting on
+        return await asyncio.shield(self._start_load(key))
+
+    def _refresh_in_background(self, key):
+        if key in self._inflight:
+            return
+        task = self._start_load(key)
+        task.add_done_callback(self._log_refresh_error)
+
+    @staticmethod
+    def _log_refresh_error(task):
+        if not task.cancelled() and task.exception() is not None:
+            # Keep serving the stale value; the next access will try again
+            print(f"❌ Background cache refresh failed: {task.exception()}")
+
+    def _store(self, key, value):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def peek(self, key):
+        """(value, age in seconds) for any stored entry however old, or None; used as a fallback"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[0], time.monotonic() - entry[1]
+
+    def invalidate(self, key=None):
+        """Mark one key (or everything) as expired; stale values stay servable while they refresh"""
+        expired_at = time.monotonic() - self.ttl
+        keys = [key] if key is not None else list(self._entries)
+        for k in keys:
+            if k in self._entries:
+                self._entries[k] = (self._entries[k][0], min(self._entries[k][1], expired_at))
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,184 @@
+import datetime
+
+import numpy as np
+
+WINDOW_DAYS = 7
+# Change-only entries per commodity: one per price change plus one per day, so a 5 minute ingest
+# needs at most 7 * 288 + 7 = 2023 over the window
+CAPACITY = 2048
+
+# Raw rows still inside the window, oldest first (the same rows database.RETENTION_SQL keeps)
+HISTORY_SQL = """
+    SELECT id, commodity_name, timestamp, last_seen, samples, price_buy, price_sell, weight_scu
+    FROM commodity_prices
+    WHERE last_seen >= datetime('now', ?)
+    ORDER BY id
+"""
+
+# Rows added or touched since the last sync
+HISTORY_SINCE_SQL = """
+    SELECT id, commodity_name, timestamp, last_seen, samples, price_buy, price_sell, weight_scu
+    FROM commodity_prices
+    WHERE last_seen >= ?
+    ORDER BY id
+"""
+
+_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _epoch(text):
+    return int(datetime.datetime.strptime(text, _FORMAT).replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+def _text(epoch):
+    return datetime.datetime.fromtimestamp(int(epoch), datetime.timezone.utc).strftime(_FORMAT)
+
+
+class PriceHistory:
+    """Resident last-7-days price history, one fixed-size ring buffer row per commodity
+
+    Mirrors commodity_prices' change-only rows: an entry is (first seen, last seen, samples,
+    buy, sell), and syncing applies the rows added or touched since the last sync. Storage is a (commodities x CAPACITY) block per
+    field (uint32 seconds, float32 prices, uint32 samples), i.e. 20 bytes per entry or 40 KiB
+    per commodity, allocated once per commodity. Latest price is O(1); window queries touch
+    only the entries they return.
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self._rows = {}  # commodity name -> row
+        self._alloc(0)
+
+    def _alloc(self, rows):
+        shape = (rows, self.capacity)
+        self.first_seen = np.zeros(shape, dtype=np.uint32)
+        self.last_seen = np.zeros(shape, dtype=np.uint32)
+        self.samples = np.zeros(shape, dtype=np.uint32)
+        self.buy = np.zeros(shape, dtype=np.float32)
+        self.sell = np.zeros(shape, dtype=np.float32)
+        self.head = np.zeros(rows, dtype=np.int32)   # next slot to write
+        self.count = np.zeros(rows, dtype=np.int32)
+        self.weight = np.zeros(rows, dtype=np.int32)
+        self.newest_id = np.zeros(rows, dtype=np.int64)  # commodity_prices id of the newest entry
+        self._last = {}  # row -> (buy, sell) as stored, so latest() returns exact prices
+
+    def _row(self, name):
+        row = self._rows.get(name)
+        if row is None:
+            row = self._rows[name] = len(self._rows)
+            if row >= len(self.head):
+                self._grow(max(2 * len(self.head), 64))
+        return row
+
+    def _grow(self, rows):
+        old = self._arrays()
+        last = self._last
+        self._alloc(rows)
+        n = len(old[0])
+        for new, previous in zip(self._arrays(), old):
+            new[:n] = previous
+        self._last = last
+
+    def _arrays(self):
+        return (self.first_seen, self.last_seen, self.samples, self.buy, self.sell,
+                self.head, self.count, self.weight, self.newest_id)
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self._arrays())
+
+    # --- Writes -------------------------------------------------------------
+
+    def _newest(self, row):
+        return (self.head[row] - 1) % self.capacity
+
+    def _append(self, row, first_seen, last_seen, samples, buy, sell):
+        i = self.head[row]
+        self.first_seen[row, i], self.last_seen[row, i], self.samples[row, i] = first_seen, last_seen, samples
+        self.buy[row, i], self.sell[row, i] = buy, sell
+        self.head[row] = (i + 1) % self.capacity
+        self.count[row] = min(self.count[row] + 1, self.capacity)
+
+    def load(self, rows):
+        """Apply stored commodity_prices rows (HISTORY_SQL shape), oldest first
+
+        The row behind a commodity's newest entry updates it (samples and last_seen grow while
+        the price stays put), later rows are appended and earlier ones ignored, so overlapping
+        syncs are harmless.
+        """
+        for price_id, name, timestamp, last_seen, samples, price_buy, price_sell, weight_scu in rows:
+            row = self._row(name)
+            if self.count[row] and price_id == self.newest_id[row]:
+                newest = self._newest(row)
+                self.last_seen[row, newest], self.samples[row, newest] = _epoch(last_seen or timestamp), samples or 1
+                continue
+            if self.count[row] and price_id < self.newest_id[row]:
+                continue
+            self._append(row, _epoch(timestamp), _epoch(last_seen or timestamp), samples or 1, price_buy, price_sell)
+            self.newest_id[row] = price_id
+            self.weight[row] = weight_scu or 0
+            self._last[row] = (price_buy, price_sell)
+
+    def rebuild(self, rows):
+        self._rows = {}
+        self._alloc(0)
+        self.load(rows)
+
+    def high_water(self):
+        """Latest last_seen across commodities (UTC text), for incremental syncs; None when empty"""
+        if not self._rows:
+            return None
+        rows = np.flatnonzero(self.count[:len(self._rows)])
+        if not len(rows):
+            return None
+        return _text(self.last_seen[rows, (self.head[rows] - 1) % self.capacity].max())
+
+    # --- Reads --------------------------------------------------------------
+
+    def latest(self, name):
+        """(price_buy, price_sell, weight_scu, last seen as UTC text) or None; O(1)"""
+        row = self._rows.get(name)
+        if row is None or not self.count[row]:
+            return None
+        buy, sell = self._last[row]
+        return buy, sell, int(self.weight[row]), _text(self.last_seen[row, self._newest(row)])
+
+    def window(self, name, since):
+        """Entries first seen at or after `since` (epoch seconds), oldest first, as
+        (first_seen, samples, buy, sell) arrays; O(entries returned + log capacity)"""
+        row = self._rows.get(name)
+        empty = (np.empty(0, np.uint32), np.empty(0, np.uint32), np.empty(0, np.float32), np.empty(0, np.float32))
+        if row is None or not self.count[row]:
+            return empty
+
+        count, start = self.count[row], (self.head[row] - self.count[row]) % self.capacity
+        # Binary search over the ring in logical (oldest-first) order
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.first_seen[row, (start + mid) % self.capacity] < since:
+                lo = mid + 1
+            else:
+                hi = mid
+        index = (start + np.arange(lo, count)) % self.capacity
+        return self.first_seen[row, index], self.samples[row, index], self.buy[row, index], self.sell[row, index]
+
+    def daily_trend(self, name, days=WINDOW_DAYS, today=None):
+        """[(day, mean buy, mean sell)] from `days` ago through today, sample-weighted like the daily rollups"""
+        today = today or datetime.datetime.now(datetime.timezone.utc).date()
+        since = datetime.datetime.combine(today - datetime.timedelta(days=days), datetime.time(),
+                                          datetime.timezone.utc)
+        first_seen, samples, buy, sell = self.window(name, int(since.timestamp()))
+        if not len(first_seen):
+            return []
+
+        day = first_seen // 86400
+        days_seen, group = np.unique(day, return_inverse=True)
+        weight = samples.astype(np.float64)
+        total = np.bincount(group, weights=weight)
+        mean_buy = np.bincount(group, weights=weight * buy) / total
+        mean_sell = np.bincount(group, weights=weight * sell) / total
+        return [(_text(int(d) * 86400)[:10], float(b), float(s)) for d, b, s in zip(days_seen, mean_buy, mean_sell)]
@@ -0,0 +1,212 @@
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+import traceback
+
+import metrics
+
+# APT_PROFILE=1 turns on the loop lag monitor, the stall watchdog and asyncio's slow-callback log
+PROFILE_ENABLED = os.getenv("APT_PROFILE", "0") == "1"
+# A callback or stall longer than this is logged (seconds)
+SLOW_CALLBACK = float(os.getenv("APT_SLOW_CALLBACK", "0.1"))
+PROFILE_DIR = os.getenv("APT_PROFILE_DIR", "profiles")
+
+loop_lag_seconds = metrics.registry.histogram("apt_loop_lag_seconds", "Event loop scheduling lag")
+loop_stalls = metrics.registry.counter("apt_loop_stalls_total", "Event loop stalls caught by the watchdog")
+
+
+class LoopMonitor:
+    """Measures event loop lag and dumps the loop thread's stack when it stalls
+
+    A task on the loop wakes every `interval` and records how late it woke (the lag) and a
+    heartbeat. A watchdog thread checks the heartbeat; when the loop hasn't ticked for
+    `threshold`, the callback blocking it is still on the stack, so the stack is printed once
+    per stall. asyncio debug mode is switched on as well, which logs each slow callback by name.
+    """
+
+    def __init__(self, interval=0.05, threshold=SLOW_CALLBACK, asyncio_debug=True):
+        self.interval = interval
+        self.threshold = threshold
+        self.asyncio_debug = asyncio_debug
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._heartbeat = time.monotonic()
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+        self._loop_thread = None
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self.asyncio_debug:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.threshold
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        print(f"🩺 Profiling mode: loop lag monitor on, stalls over {self.threshold * 1000:.0f} ms are logged.")
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _tick(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - expected, 0.0)
+            self._heartbeat = now
+            loop_lag_seconds.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def _watch(self):
+        reported = None
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self._heartbeat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.threshold or beat == reported:
+                continue
+            reported = beat  # one report per stall
+            self.stalls += 1
+            loop_stalls.inc()
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "  (stack unavailable)\n"
+            print(f"🐢 Event loop blocked for {stalled * 1000:.0f} ms+, loop thread is at:\n{stack}", file=sys.stderr)
+
+
+def _collapse(frame):
+    """Root-first 'module:function;module:function' stack, the flamegraph.pl collapsed format"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples thread stacks from a background thread into collapsed-stack counts
+
+    `threads="loop"` samples only the thread that started the profiler (the event loop); "all"
+    samples every thread, prefixing each stack with the thread name. While `gate` is set to a
+    callable, samples are only kept when it returns true (used to profile a single command).
+    """
+
+    def __init__(self, interval=0.005, threads="loop"):
+        self.interval = interval
+        self.threads = threads
+        self.samples = collections.Counter()
+        self.sample_count = 0
+        self.gate = None
+        self._target = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        self.samples.clear()
+        self.sample_count = 0
+        self._target = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and return the collapsed stacks"""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        return self.samples
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stopped.wait(self.interval):
+            if self.gate is not None and not self.gate():
+                continue
+            frames = sys._current_frames()
+            if self.threads == "loop":
+                frames = {self._target: frames.get(self._target)}
+            else:
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == me or frame is None:
+                    continue
+                stack = _collapse(frame)
+                if self.threads != "loop":
+                    stack = f"{names.get(ident, ident)};{stack}"
+                self.samples[stack] += 1
+            self.sample_count += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def dump(self, label, directory=PROFILE_DIR):
+        """Write the collapsed stacks to `directory`; returns the path"""
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)
+        path = os.path.join(directory, f"{stamp}-{safe}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return path
+
+
+class CommandProfiler:
+    """Profiles invocations of one slash command (or everything) for a time window"""
+
+    def __init__(self):
+        self.profiler = None
+        self.command = None
+        self._active = 0
+        self._window = 0  # bumped per run() so invocations that outlive their window can't touch the next
+        self.invocations = 0
+
+    @property
+    def busy(self):
+        return self.profiler is not None
+
+    def enter(self, command_name):
+        """Called as a command starts; returns a token to pass to exit() when this invocation
+        is being profiled, else None"""
+        if self.profiler is None or self.command is None or command_name != self.command:
+            return None
+        self._active += 1
+        self.invocations += 1
+        return self._window
+
+    def exit(self, token):
+        if token == self._window and self.profiler is not None:
+            self._active -= 1
+
+    async def run(self, seconds, command=None, interval=0.005):
+        """Sample for `seconds`, gated to `command`'s invocations when given; returns (profiler, path)"""
+        if self.busy:
+            raise RuntimeError("A profile is already being recorded")
+        profiler = SamplingProfiler(interval=interval, threads="loop" if command else "all")
+        if command:
+            profiler.gate = lambda: self._active > 0
+        self.profiler, self.command, self.invocations = profiler, command, 0
+        self._window += 1
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+            self.profiler, self.command, self._active = None, None, 0
+        path = await asyncio.to_thread(profiler.dump, command or "process")
+        return profiler, path
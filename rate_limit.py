@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        """Wait until `tokens` are available and take them"""
+        # The lock keeps waiters in FIFO order so a burst can't starve earlier callers
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
@@ -0,0 +1,152 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import NamedTuple, Optional
+
+import aiosqlite
+
+import database
+import metrics
+from migrations import migrate
+
+# sqlite3 keeps compiled statements per connection; the repository only ever issues the
+# constant SQL strings from database.py, so every query after the first is a cache hit
+STATEMENT_CACHE_SIZE = 256
+
+
+class LatestPrice(NamedTuple):
+    price_buy: float
+    price_sell: float
+    weight_scu: int
+    updated_at: str
+
+
+class TrendPoint(NamedTuple):
+    day: str
+    price_buy: float
+    price_sell: float
+
+
+class Repository:
+    """Async data access for organizations.db
+
+    Reads go through a pool of long-lived aiosqlite connections. Writes are functions
+    `func(conn, *args)` queued onto one dedicated writer thread that owns the only write
+    connection, so writes are serialized in FIFO order, each runs in its own transaction,
+    and nothing ever waits on another writer's lock.
+    """
+
+    def __init__(self, path=None, readers=4):
+        self.path = path
+        self.reader_count = readers
+        self._readers = None
+        self._writer = None
+        self._write_conn = None
+
+    @property
+    def is_open(self):
+        return self._readers is not None
+
+    async def open(self):
+        """Migrate the schema and open the connection pools; safe to call more than once"""
+        if self.is_open:
+            return
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        await self._submit(self._open_writer)
+        await self._submit(migrate, self._write_conn)
+
+        self._readers = asyncio.Queue()
+        for _ in range(self.reader_count):
+            conn = await aiosqlite.connect(self.path or database.DB_PATH, cached_statements=STATEMENT_CACHE_SIZE)
+            for pragma in database.PRAGMAS:
+                await conn.execute(pragma)
+            await conn.execute("PRAGMA query_only=1")
+            self._readers.put_nowait(conn)
+
+    def _open_writer(self):
+        self._write_conn = database.connect(self.path)
+        # Transactions are explicit (database.transaction); don't let sqlite3 open them implicitly
+        self._write_conn.isolation_level = None
+
+    async def close(self):
+        if self._readers is not None:
+            readers, self._readers = self._readers, None
+            while not readers.empty():
+                await readers.get_nowait().close()
+        if self._writer is not None:
+            await self._submit(self._write_conn.close)
+            self._writer.shutdown(wait=True)
+            self._writer = None
+
+    def _submit(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self._writer, func, *args)
+
+    # --- Writes -------------------------------------------------------------
+
+    def _run_write(self, func, args):
+        # Timed on the writer thread so the figure excludes time spent queued behind other writes
+        with metrics.db_query_seconds.time(query=func.__name__, kind="write"):
+            with database.transaction(self._write_conn) as conn:
+                return func(conn, *args)
+
+    async def write(self, func, *args):
+        """Queue `func(conn, *args)` on the writer thread inside one transaction and return its result"""
+        return await self._submit(self._run_write, func, args)
+
+    # --- Reads --------------------------------------------------------------
+
+    @asynccontextmanager
+    async def reader(self):
+        """Borrow a read-only aiosqlite connection from the pool"""
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    # `name` labels the query in metrics.db_query_seconds; ad-hoc SQL is labelled by verb and table
+
+    async def fetchone(self, sql, params=(), name=None):
+        async with self.reader() as conn:
+            with metrics.db_query_seconds.time(query=name or metrics.query_label(sql), kind="read"):
+                async with conn.execute(sql, params) as cursor:
+                    return await cursor.fetchone()
+
+    async def fetchall(self, sql, params=(), name=None):
+        async with self.reader() as conn:
+            with metrics.db_query_seconds.time(query=name or metrics.query_label(sql), kind="read"):
+                async with conn.execute(sql, params) as cursor:
+                    return await cursor.fetchall()
+
+    async def fetchall_dicts(self, sql, params=(), name=None):
+        async with self.reader() as conn:
+            with metrics.db_query_seconds.time(query=name or metrics.query_label(sql), kind="read"):
+                async with conn.execute(sql, params) as cursor:
+                    columns = [d[0] for d in cursor.description]
+                    return [dict(zip(columns, row)) for row in await cursor.fetchall()]
+
+    # --- Typed queries ------------------------------------------------------
+
+    async def commodity_names(self) -> list[str]:
+        return [row[0] for row in await self.fetchall(database.COMMODITY_NAMES_SQL, name="commodity_names")]
+
+    async def latest_price(self, commodity_name: str) -> Optional[LatestPrice]:
+        row = await self.fetchone(database.LATEST_PRICE_SQL, (commodity_name,), name="latest_price")
+        return LatestPrice(*row) if row else None
+
+    async def daily_trend(self, commodity_name: str, days: int = 7) -> list[TrendPoint]:
+        rows = await self.fetchall(database.DAILY_TREND_SQL, (commodity_name, f"-{days} days"), name="daily_trend")
+        return [TrendPoint(*row) for row in rows]
+
+    async def store_commodity_prices(self, commodities, now) -> tuple[int, int]:
+        return await self.write(database.store_commodity_prices, commodities, now)
+
+    async def terminal_prices(self, commodity_name: str) -> list[dict]:
+        """Stored terminal rows for one commodity, shaped like the UEX `commodities_prices` data"""
+        return await self.fetchall_dicts(database.COMMODITY_TERMINAL_PRICES_SQL, (commodity_name,), name="terminal_prices")
+
+    async def all_terminal_prices(self) -> list[dict]:
+        return await self.fetchall_dicts(database.TERMINAL_PRICES_SQL, name="all_terminal_prices")
+
+    async def store_terminal_prices(self, rows, now) -> int:
+        return await self.write(database.store_terminal_prices, rows, now)
@@ -0,0 +1,82 @@
+import datetime
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+STARTUP_LOG = os.getenv("APT_STARTUP_LOG", "startup_profile.jsonl")
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux but bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class StartupProfile:
+    """Records cold-start timings: imports, time to on_ready and time to first ingest"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports = {}   # label -> seconds
+        self.marks = {}     # milestone -> seconds since process start
+        self.reported = False
+
+    @contextmanager
+    def importing(self, label):
+        """Time the import statements inside the block under `label`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.imports[label] = time.perf_counter() - start
+
+    def mark(self, milestone):
+        """Record a milestone once; later calls (e.g. on reconnect) are ignored"""
+        if milestone not in self.marks:
+            self.marks[milestone] = time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "imports": {k: round(v, 4) for k, v in self.imports.items()},
+            "milestones": {k: round(v, 3) for k, v in self.marks.items()},
+            "max_rss_mb": _max_rss_mb(),
+        }
+
+    def report(self):
+        lines = ["⏱️ Startup profile:"]
+        for label, seconds in sorted(self.imports.items(), key=lambda item: -item[1]):
+            lines.append(f"   import {label:<20} {seconds * 1000:8.1f} ms")
+        for milestone, seconds in self.marks.items():
+            lines.append(f"   {milestone:<27} {seconds:8.2f} s")
+        rss = _max_rss_mb()
+        if rss is not None:
+            lines.append(f"   {'max RSS':<27} {rss:8.1f} MB")
+        return "\n".join(lines)
+
+    def finish(self):
+        """Print the report and append it to STARTUP_LOG so cold starts can be compared over time"""
+        if self.reported:
+            return
+        self.reported = True
+        print(self.report())
+        if STARTUP_LOG:
+            try:
+                with open(STARTUP_LOG, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(self.as_dict()) + "\n")
+            except OSError as e:
+                print(f"❌ Could not write startup profile: {e}")
+
+
+# Module-level instance so the clock starts as early as bot.py imports it
+startup = StartupProfile()
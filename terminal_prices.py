@@ -0,0 +1,65 @@
+import asyncio
+
+from uex_client import UEXError
+
+
+class TerminalPriceJob:
+    """Sweeps `commodities_prices` for every commodity with bounded concurrency
+
+    Individual commodities that fail are skipped (their stored rows are kept). When most of a
+    sweep fails, the job backs off and skips the next 1, 2, 4... runs, up to `max_skip`.
+    """
+
+    def __init__(self, client, concurrency=4, max_skip=8):
+        self.client = client
+        self.concurrency = concurrency
+        self.max_skip = max_skip
+        self.failed_sweeps = 0
+        self._skip = 0
+        self.last_sweep = None  # (rows, failed commodity names)
+
+    async def _fetch_one(self, semaphore, name):
+        async with semaphore:
+            data = await self.client.commodity_prices(name)
+        if data.get("status") != "ok":
+            raise UEXError(f"UEX API status {data.get('status')!r} for {name}")
+        return data.get("data") or []
+
+    async def sweep(self, commodity_names):
+        """Fetch every commodity's terminal prices; returns (rows, failed names)"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        names = list(commodity_names)
+        results = await asyncio.gather(*(self._fetch_one(semaphore, n) for n in names), return_exceptions=True)
+
+        rows, failed = [], []
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                failed.append(name)
+            else:
+                rows.extend(result)
+        return rows, failed
+
+    async def run(self, commodity_names):
+        """One scheduled run; returns the fetched rows, or None if skipped or mostly failed"""
+        if self._skip:
+            self._skip -= 1
+            print(f"⏸️ Terminal price sweep backing off ({self._skip} more run(s) to skip).")
+            return None
+
+        if not self.client.available:
+            print("⏸️ Terminal price sweep skipped: UEX API circuit is open.")
+            return None
+
+        names = list(commodity_names)
+        rows, failed = await self.sweep(names)
+        self.last_sweep = (rows, failed)
+        if failed and len(failed) * 2 > len(names):
+            self.failed_sweeps += 1
+            self._skip = min(2 ** (self.failed_sweeps - 1), self.max_skip)
+            print(f"❌ Terminal price sweep failed for {len(failed)} commodities; backing off.")
+            return None
+
+        self.failed_sweeps = 0
+        if failed:
+            print(f"⚠️ Terminal price sweep skipped {len(failed)} commodities: {', '.join(failed[:5])}")
+        return rows
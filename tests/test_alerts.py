@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alerts import AlertEngine
+from ingest import CommoditySnapshot
+from repository import Repository
+
+
+class SellOnlyAlertTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.repo = Repository(os.path.join(self.workdir.name, "alerts.db"))
+        await self.repo.open()
+        self.engine = AlertEngine(self.repo, cooldown_minutes=0)
+
+    async def asyncTearDown(self):
+        await self.repo.close()
+        self.workdir.cleanup()
+
+    async def test_sell_only_commodity_alerts(self):
+        fired = []
+        for sell in (100, 200, 400):
+            snapshot = CommoditySnapshot([
+                {"name": "Gold", "price_buy": 50, "price_sell": sell},
+                {"name": "Ore", "price_buy": 0, "price_sell": sell},
+            ])
+            fired.append({alert.name: alert.change for alert in await self.engine.evaluate(snapshot)})
+
+        self.assertEqual(fired[0], {})
+        self.assertEqual(fired[1], {"Gold": 1.0, "Ore": 1.0})
+        self.assertEqual(fired[2], {"Gold": 1.0, "Ore": 1.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import heapq
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Terminal details copied from the UEX price rows for display
+TERMINAL_FIELDS = ("terminal_name", "star_system_name", "planet_name", "city_name", "faction_name")
+
+
+@dataclass
+class Leg:
+    origin: int
+    destination: int
+    commodity: int
+    scu: int
+    price_buy: float
+    price_sell: float
+
+    @property
+    def profit(self):
+        return self.scu * (self.price_sell - self.price_buy)
+
+
+@dataclass(order=True)
+class Route:
+    profit: float
+    capital: float = field(compare=False)
+    legs: list = field(compare=False, default_factory=list)
+
+    @property
+    def terminal(self):
+        return self.legs[-1].destination if self.legs else None
+
+
+class PriceMatrix:
+    """Terminal x commodity price matrices built from UEX `commodities_prices` rows
+
+    buy[t, c]    price a player pays at terminal t (NaN where t doesn't sell c)
+    sell[t, c]   price terminal t pays (NaN where t doesn't buy c)
+    stock[t, c]  SCU available to buy at t (inf when unknown)
+    demand[t, c] SCU terminal t will take (inf when unknown)
+    best_margin[i, j] best per-SCU margin over all commodities from i to j
+    sold_at[t]   indexes of the commodities terminal t sells, so legs only scan those columns
+    """
+
+    def __init__(self, rows):
+        terminals, commodities = {}, {}
+        for row in rows:
+            if row.get("id_terminal") is None or not row.get("commodity_name"):
+                continue
+            terminals.setdefault(row["id_terminal"], {k: row.get(k) for k in TERMINAL_FIELDS})
+            commodities.setdefault(row["commodity_name"], len(commodities))
+
+        self.terminal_ids = list(terminals)
+        self.terminals = list(terminals.values())
+        self.commodities = list(commodities)
+        t_index = {tid: i for i, tid in enumerate(self.terminal_ids)}
+
+        shape = (len(self.terminals), len(self.commodities))
+        self.buy = np.full(shape, np.nan, dtype=np.float32)
+        self.sell = np.full(shape, np.nan, dtype=np.float32)
+        self.stock = np.full(shape, np.inf, dtype=np.float32)
+        self.demand = np.full(shape, np.inf, dtype=np.float32)
+
+        for row in rows:
+            if row.get("id_terminal") not in t_index or row.get("commodity_name") not in commodities:
+                continue
+            t, c = t_index[row["id_terminal"]], commodities[row["commodity_name"]]
+            if (row.get("price_buy") or 0) > 0:
+                self.buy[t, c] = row["price_buy"]
+                # UEX reports 0 when the inventory is unknown, so only trust positive values
+                if (row.get("scu_buy") or 0) > 0:
+                    self.stock[t, c] = row["scu_buy"]
+            if (row.get("price_sell") or 0) > 0:
+                self.sell[t, c] = row["price_sell"]
+                if (row.get("scu_sell") or 0) > 0:
+                    self.demand[t, c] = row["scu_sell"]
+
+        self.sold_at = [np.flatnonzero(self.buy[t] > 0) for t in range(shape[0])]
+        self.best_margin = np.full((shape[0], shape[0]), -np.inf, dtype=np.float32)
+        for i, cols in enumerate(self.sold_at):
+            if len(cols):
+                margin = np.nan_to_num(self.sell[:, cols] - self.buy[i, cols], nan=-np.inf)
+                self.best_margin[i] = margin.max(axis=1)
+        np.fill_diagonal(self.best_margin, -np.inf)
+
+    def __len__(self):
+        return len(self.terminals)
+
+    def terminal_index(self, name):
+        for i, terminal in enumerate(self.terminals):
+            if (terminal["terminal_name"] or "").lower() == name.lower():
+                return i
+        return None
+
+    def best_legs(self, origin, cargo_scu, capital):
+        """Best single commodity run from `origin` to every terminal: (profit, commodity, scu) arrays"""
+        cols = self.sold_at[origin]
+        n = len(self.terminals)
+        if not len(cols):
+            return np.zeros(n, dtype=np.float32), np.zeros(n, dtype=np.intp), np.zeros(n, dtype=np.float32)
+
+        buy = self.buy[origin, cols]
+        scu = np.minimum(np.minimum(np.floor(capital / buy), self.stock[origin, cols]), cargo_scu)
+        scu = np.floor(np.minimum(scu[None, :], self.demand[:, cols]))
+
+        margin = self.sell[:, cols] - buy[None, :]
+        profit = np.where(margin > 0, scu * margin, 0.0)
+        best_col = np.argmax(profit, axis=1)
+        rows = np.arange(n)
+        best = profit[rows, best_col]
+        best[origin] = 0.0
+        return best, cols[best_col], scu[rows, best_col]
+
+
+def plan_routes(matrix, cargo_scu, capital, max_stops=3, start=None, top_n=3, beam_width=24):
+    """Top `top_n` routes visiting at most `max_stops` terminals, reinvesting profit at every stop
+
+    Beam search: each step evaluates the best leg from every beam state to every terminal as one
+    (states x terminals) array, keeps the best state arriving at each terminal, and carries the
+    `beam_width` most profitable of those forward. Only the winners become Route objects, and
+    routes that are just the start of a longer one found later are not returned.
+    """
+    if not len(matrix) or cargo_scu <= 0 or capital <= 0 or max_stops < 2:
+        return []
+
+    if start is not None:
+        beam = [(start, Route(0.0, capital))]
+    else:
+        # Skip origins with no profitable outbound leg at all
+        beam = [(int(i), Route(0.0, capital)) for i in np.flatnonzero(np.nanmax(matrix.best_margin, axis=1) > 0)]
+
+    finished = []
+    for _ in range(max_stops - 1):
+        if not beam:
+            break
+        legs = [matrix.best_legs(origin, cargo_scu, route.capital) for origin, route in beam]
+        leg_profit = np.stack([profit for profit, _, _ in legs])
+        totals = np.array([route.profit for _, route in beam])[:, None] + leg_profit
+        totals[leg_profit <= 0] = -np.inf
+
+        # Best way to arrive at each terminal, then the beam_width best arrivals
+        best_state = np.argmax(totals, axis=0)
+        arrival = totals[best_state, np.arange(totals.shape[1])]
+        order = np.argsort(-arrival)[:max(beam_width, top_n)]
+
+        next_beam = []
+        for dest in order:
+            if not np.isfinite(arrival[dest]):
+                break
+            s = int(best_state[dest])
+            origin, route = beam[s]
+            c = int(legs[s][1][dest])
+            leg = Leg(origin, int(dest), c, int(legs[s][2][dest]),
+                      float(matrix.buy[origin, c]), float(matrix.sell[dest, c]))
+            nxt = Route(route.profit + leg.profit, route.capital + leg.profit, route.legs + [leg])
+            next_beam.append((int(dest), nxt))
+            finished.append(nxt)
+        beam = next_beam[:beam_width]
+
+    # Every round's routes are kept, so a route and its own extensions are all in `finished`. An
+    # extension only adds profitable legs and always outranks its prefix; drop the prefixes so
+    # the top routes are alternatives, not one route at several lengths
+    def key(route):
+        return tuple((leg.origin, leg.destination, leg.commodity) for leg in route.legs)
+
+    prefixes = {key(route)[:n] for route in finished for n in range(1, len(route.legs))}
+    return heapq.nlargest(top_n, (route for route in finished if key(route) not in prefixes))
+
+
+class TradeRouteEngine:
+    """Holds the latest PriceMatrix; rebuilt once per ingest, queried per command"""
+
+    def __init__(self):
+        self.matrix = None
+
+    def rebuild(self, rows):
+        self.matrix = PriceMatrix(rows)
+        return self.matrix
+
+    def terminal_names(self):
+        return [t["terminal_name"] for t in self.matrix.terminals if t["terminal_name"]] if self.matrix else []
+
+    def plan(self, cargo_scu, capital, max_stops=3, start_terminal=None, top_n=3):
+        """Return (matrix, routes); the matrix is returned so callers describe routes with the same data"""
+        matrix = self.matrix
+        if matrix is None:
+            return None, []
+        start = matrix.terminal_index(start_terminal) if start_terminal else None
+        if start_terminal and start is None:
+            raise ValueError(f"Unknown terminal `{start_terminal}`")
+        return matrix, plan_routes(matrix, cargo_scu, capital, max_stops=max_stops, start=start, top_n=top_n)
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import random
+import time
+
+import aiohttp
+
+import metrics
+from circuit_breaker import CircuitBreaker
+from rate_limit import TokenBucket
+
+UEX_API_BASE = os.getenv("UEX_API_BASE", "https://api.uexcorp.space/2.0")
+
+# Statuses worth retrying; anything else non-200 is returned to the caller as an error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UEXError(Exception):
+    """Raised when the UEX API can't be reached or answers with an error"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(UEXError):
+    """Raised without calling the API while the circuit breaker is open"""
+
+
+class UEXClient:
+    """Long-lived UEX API client sharing one keep-alive connection pool"""
+
+    def __init__(self, base_url=UEX_API_BASE, timeout=10, max_concurrency=4,
+                 rate=2.0, burst=5, retries=3, backoff=0.5, breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self._bucket = TokenBucket(rate, burst)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session = None
+        # Trips on errors or calls slower than 3s so commands fall back to local data quickly
+        self.breaker = breaker or CircuitBreaker(slow_call=3.0)
+
+    @property
+    def available(self):
+        """False while the circuit breaker is refusing calls"""
+        return not self.breaker.is_open
+
+    def _get_session(self):
+        # Created lazily so the session binds to the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={"Accept": "application/json"},
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def _retry_delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after
+        # Full jitter keeps restarted shards from retrying in lockstep
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    async def get(self, path, params=None):
+        """GET `path` relative to the API base and return the decoded JSON body"""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        last_error = None
+
+        endpoint = path.strip("/")
+
+        for attempt in range(self.retries + 1):
+            # Fail fast without queueing while the circuit is open; the probe slot itself is only
+            # taken once the rate limit and concurrency waits are over (see allow() below)
+            if self.breaker.is_open:
+                raise CircuitOpenError(f"UEX API unavailable, retrying in {self.breaker.retry_after():.0f}s")
+            retry_after = None
+            await self._bucket.acquire()
+            status = "error"
+            try:
+                async with self._semaphore:
+                    if not self.breaker.allow():
+                        raise CircuitOpenError(f"UEX API unavailable, retrying in {self.breaker.retry_after():.0f}s")
+                    start = time.perf_counter()
+                    try:
+                        async with self._get_session().get(url, params=params) as response:
+                            status = response.status
+                            body = await response.read()
+                            metrics.uex_response_bytes.inc(len(body), endpoint=endpoint)
+                            if response.status == 200:
+                                return await response.json(content_type=None)
+                            last_error = UEXError(f"UEX API returned HTTP {response.status}", response.status)
+                            if response.status not in RETRY_STATUSES:
+                                raise last_error
+                            header = response.headers.get("Retry-After")
+                            if header and header.isdigit():
+                                retry_after = int(header)
+                    except asyncio.CancelledError:
+                        # Cancelled by our side (e.g. the poller stopping): no verdict on the API
+                        self.breaker.cancel_probe()
+                        status = "cancelled"
+                        raise
+                    finally:
+                        elapsed = time.perf_counter() - start
+                        if status != "cancelled":
+                            # Client errors (4xx) mean the API is up; only retryable statuses and transport errors count
+                            self.breaker.record(status != "error" and status not in RETRY_STATUSES, elapsed)
+                        metrics.uex_request_seconds.observe(elapsed, endpoint=endpoint, status=status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = UEXError(f"UEX API request failed: {e or type(e).__name__}")
+
+            if attempt < self.retries:
+                await asyncio.sleep(self._retry_delay(attempt, retry_after))
+
+        raise last_error
+
+    async def commodities(self):
+        """Average prices for every commodity"""
+        return await self.get("commodities")
+
+    async def commodity_prices(self, commodity_name=None, commodity_id=None):
+        """Terminal-level prices for one commodity, by name or id"""
+        if commodity_id is not None:
+            return await self.get("commodities_prices", {"id_commodity": commodity_id})
+        return await self.get("commodities_prices", {"commodity_name": commodity_name})